@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+from kpis import KPI_KEYS, RATE_KEYS, SUMMARY_KEYS, score_clinics, validate_batch
+from rules import load_rules
+
+# API HTTP local con los mismos cálculos que app.py, sin dependencias fuera de la biblioteca
+# estándar y las del proyecto:
+#
+#   python api.py --host 127.0.0.1 --port 8765
+#
+#   POST /score   un objeto o una lista de objetos con el formato de report.py:
+#                 {"clinic_id", "company", "ticket", "recovery", "summary": {...}, "channels": [{...}]}
+#   GET  /health
+#
+# Las solicitudes concurrentes se agrupan en lotes (hasta MAX_BATCH o MAX_WAIT segundos) y cada
+# lote se calcula con score_clinics, validate_batch y las reglas de rules.py en una sola pasada
+# por columnas.
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TICKET = 300.0
+DEFAULT_RECOVERY = 50.0
+MAX_BATCH = 512
+MAX_WAIT = 0.002
+MAX_BODY_BYTES = 1024 * 1024
+INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+class PayloadError(ValueError):
+    pass
+
+
+def _number(value: object) -> float:
+    number = float(value)
+    if not math.isfinite(number):
+        raise PayloadError("Los valores numéricos deben ser finitos.")
+    return number
+
+
+# Un conteo es un entero JSON no negativo (3.0 se acepta); true, 3.9, -5 o "7" no.
+def _count(value: object) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise PayloadError("Los conteos deben ser enteros no negativos.")
+    if isinstance(value, float) and not value.is_integer():
+        raise PayloadError("Los conteos deben ser enteros no negativos.")
+    count = int(value)
+    if count < 0:
+        raise PayloadError("Los conteos deben ser enteros no negativos.")
+    if count > INT64_MAX:
+        raise PayloadError("Conteo fuera de rango.")
+    return count
+
+
+def parse_record(payload: object) -> dict:
+    if not isinstance(payload, dict):
+        raise PayloadError("Cada clínica debe ser un objeto JSON.")
+    try:
+        channels = payload["channels"]
+        summary = payload["summary"]
+        return {
+            "clinic_id": str(payload.get("clinic_id", "")),
+            "company": str(payload.get("company", "")).strip(),
+            "ticket": _number(payload.get("ticket", DEFAULT_TICKET)),
+            "recovery": _number(payload.get("recovery", DEFAULT_RECOVERY)),
+            "summary": [_count(summary[k]) for k in SUMMARY_KEYS],
+            "inversion": [_number(c["inversion"]) for c in channels],
+            "counts": [(_count(c["leads"]), _count(c["citas"]), _count(c["pacientes"])) for c in channels],
+        }
+    except PayloadError:
+        raise
+    except KeyError as error:
+        raise PayloadError(f"Falta el campo {error.args[0]!r}.") from None
+    except (TypeError, ValueError, OverflowError, AttributeError):
+        raise PayloadError("Valores no numéricos en summary o channels.") from None
+
+
+def score_records(records: list[dict]) -> list[dict]:
+    n = len(records)
+    summary = np.array([r["summary"] for r in records], dtype=np.int64).reshape(n, len(SUMMARY_KEYS))
+    clinics = pd.DataFrame(summary, columns=list(SUMMARY_KEYS))
+    clinics.insert(0, "clinic_id", np.arange(n))
+    clinics["ticket"] = [r["ticket"] for r in records]
+    clinics["recovery"] = [r["recovery"] for r in records]
+
+    sizes = [len(r["inversion"]) for r in records]
+    counts = np.array([c for r in records for c in r["counts"]], dtype=np.int64).reshape(-1, 3)
+    channels = pd.DataFrame(
+        {
+            "clinic_id": np.repeat(np.arange(n), sizes),
+            "inversion": np.array([v for r in records for v in r["inversion"]], dtype=np.float64),
+            "leads": counts[:, 0],
+            "citas": counts[:, 1],
+            "pacientes": counts[:, 2],
+        }
+    )
+
+    scores = score_clinics(clinics, channels)
+    columns = {c: scores[c].tolist() for c in (*KPI_KEYS, *RATE_KEYS)}
+    rules = load_rules()
+    diagnosis = rules.classify(scores)
+    # Un bloque por conjunto de reglas: sus campos, o el texto directo si tiene uno solo (como
+    # "oportunidad" en report.py).
+    texts = {
+        name: {field: diagnosis[f"{name}_{field}"].tolist() for field in rule_set.fields}
+        for name, rule_set in rules.sets.items()
+    }
+    errors: list[list[str]] = [[] for _ in range(n)]
+    failed = validate_batch(clinics, channels)
+    for position, message in zip(failed["clinic_id"].tolist(), failed["mensaje"].tolist()):
+        errors[position].append(message)
+
+    results = []
+    for i, record in enumerate(records):
+        result = {"clinic_id": record["clinic_id"], "company": record["company"], "errores": errors[i]}
+        if not errors[i]:
+            kpis = {k: columns[k][i] for k in KPI_KEYS}
+            rates = {k: columns[k][i] for k in RATE_KEYS}
+            result.update({"rates": rates, "kpis": kpis})
+            for name, fields in texts.items():
+                values = {field: column[i] for field, column in fields.items()}
+                result[name] = values if len(values) > 1 else next(iter(values.values()))
+        results.append(result)
+    return results
+
+
+class MicroBatcher:
+    # Acumula registros hasta llenar un lote o cumplir el tiempo de espera y los calcula juntos
+    # en el hilo del bucle: cada lote tarda pocos milisegundos y así no hay cambios de hilo.
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT) -> None:
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.records = 0
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def submit(self, record: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((record, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        self.batches += 1
+        self.records += len(pending)
+        try:
+            results = score_records([record for record, _ in pending])
+        except Exception:
+            # Un registro problemático no debe hacer fallar al resto del lote: se recalcula uno
+            # por uno y solo el que falla recibe el error.
+            log.exception("Falló un lote de %d registros; se recalcula por registro", len(pending))
+            for record, future in pending:
+                self._score_one(record, future)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _score_one(record: dict, future: asyncio.Future) -> None:
+        try:
+            result = score_records([record])[0]
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+            return
+        if not future.done():
+            future.set_result(result)
+
+
+def http_response(status: HTTPStatus, payload: object, keep_alive: bool) -> bytes:
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False).encode()
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+class ScoringServer:
+    def __init__(self, batcher: MicroBatcher | None = None) -> None:
+        self.batcher = batcher or MicroBatcher()
+
+    async def route(self, method: str, path: str, body: bytes) -> tuple[HTTPStatus, object]:
+        if path == "/health":
+            return HTTPStatus.OK, {"estado": "ok", "lotes": self.batcher.batches, "registros": self.batcher.records}
+        if path != "/score":
+            return HTTPStatus.NOT_FOUND, {"error": "Ruta no encontrada."}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Usa POST."}
+        try:
+            payload = json.loads(body)
+            many = isinstance(payload, list)
+            records = [parse_record(p) for p in (payload if many else [payload])]
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return HTTPStatus.BAD_REQUEST, {"error": "JSON inválido."}
+        except PayloadError as error:
+            return HTTPStatus.BAD_REQUEST, {"error": str(error)}
+        results = await asyncio.gather(*(self.batcher.submit(r) for r in records))
+        return HTTPStatus.OK, results if many else results[0]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    too_large = {"error": "Cuerpo demasiado grande."}
+                    writer.write(http_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, too_large, False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = await self.route(method, path.split("?", 1)[0], body)
+                    response = http_response(status, payload, keep_alive)
+                except Exception:
+                    log.exception("Error al atender %s %s", method, path)
+                    error = {"error": "Error interno del servidor."}
+                    response = http_response(HTTPStatus.INTERNAL_SERVER_ERROR, error, keep_alive)
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"API de puntuación en http://{host}:{port}/score", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="API HTTP local de KPIs y validaciones.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Solicitudes máximas por lote.")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000, help="Espera máxima para llenar un lote.")
+    args = parser.parse_args(argv)
+    server = ScoringServer(MicroBatcher(args.max_batch, args.max_wait_ms / 1000))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,308 +1,323 @@
 from __future__ import annotations
 
-import copy
+import functools
 
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-
-st.set_page_config(page_title="Dashboard  de Eficiencia Comercial y Retorno de Inversión (ROI) para", layout="wide")
-
-DEFAULT_CHANNELS = pd.DataFrame(
-    {
-        "Canal": ["Meta Ads", "Google Ads", "Orgánico", "Bases de Datos"],
-        "inversion": [1200.0, 1000.0, 300.0, 200.0],
-        "leads": [100, 80, 90, 50],
-        "citas": [60, 50, 45, 25],
-        "pacientes": [35, 30, 20, 10],
-        
-    }
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from budget import (
+    BUDGET_LEVELS,
+    DEFAULT_ELASTICITY,
+    allocation_table,
+    budget_curve,
+    curve_revenue,
+    optimize,
+    proportional,
+    response_curves,
 )
+from caching import PROCESS_STATS, LRUCache, content_hash
+from datasets import SEED_DIR, load_seed
+from history import current_period, recent_periods, row_to_snapshot, trailing_annual
+from ingest import ingest_events_by_day
+from kpis import (
+    CLOSE_RATE_THRESHOLDS,
+    DEFAULT_CHANNELS,
+    build_default_summary,
+    close_rate_class,
+    compute_kpis,
+    validate_consistency,
+)
+from latency import LatencyProfile, latency_table
+from montecarlo import MC_SIMULATIONS, fit_projection, simulate_recoverable
+from peers import CLINIC_TYPES, PeerIndex, clinic_values
+from profiling import PROFILE_ENV, PROFILE_LOG, PROFILE_URL, RerunProfiler, approx_size, write_record
+from render import (
+    RENDER_CACHE,
+    bottlenecks_key,
+    build_scenario_heatmap,
+    cached_bottlenecks,
+    cached_channels_table,
+    cached_funnel_figure,
+    funnel_key,
+    module_card_html,
+    table_key,
+)
+from resources import get_history_store, get_peer_index
+from rollups import Rollup
+from rules import load_rules
+from scenarios import (
+    MAX_GRID_STEPS,
+    SCENARIO_AXES,
+    SCENARIO_METRICS,
+    axis_range,
+    scenario_base,
+    sensitivity,
+    sweep,
+)
+from state import ChannelTable, Diagnosis
+from theme import THEME_CSS
 
+st.set_page_config(page_title="Dashboard  de Eficiencia Comercial y Retorno de Inversión (ROI) para", layout="wide")
 
-def build_default_summary(channels_df: pd.DataFrame) -> dict[str, int]:
-    return {
-        "Leads totales": int(channels_df["leads"].sum()),
-        "Leads calificados": 240,
-        "Citas agendadas": int(channels_df["citas"].sum()),
-        "Citas asistidas": 140,
-        "Citas no asistidas": 40,
-        "Pacientes cerrados": int(channels_df["pacientes"].sum()),
-    }
-
-
-def format_percentage(numerator: float, denominator: float) -> float:
-    if denominator <= 0:
-        return 0.0
-    return round((numerator / denominator) * 100, 1)
-
-
-def compute_rates(summary: dict[str, int]) -> dict[str, float]:
-    return {
-        "Lead → Cita": format_percentage(summary["Citas agendadas"], summary["Leads totales"]),
-        "Asistencia → Cierre": format_percentage(summary["Pacientes cerrados"], summary["Citas asistidas"]),
-        "Show rate": format_percentage(summary["Citas asistidas"], summary["Citas agendadas"]),
-        "No-Show rate": format_percentage(summary["Citas no asistidas"], summary["Citas agendadas"]),
-        "Tasa de cierre real": format_percentage(summary["Pacientes cerrados"], summary["Leads totales"]),
-    }
-
-
-def compute_pipeline(summary: dict[str, int]) -> pd.DataFrame:
-    return pd.DataFrame(
-        {
-            "Etapa": ["No Show", "Cerrado", "Asistió", "Agendado", "Contactado", "Leads Totales"],
-            "Cantidad": [
-                summary["Citas no asistidas"],
-                summary["Pacientes cerrados"],
-                summary["Citas asistidas"],
-                summary["Citas agendadas"],
-                summary["Leads calificados"],
-                summary["Leads totales"],
-            ],
-        }
-    )
-
-
-def validate_consistency(channels_df: pd.DataFrame, summary: dict[str, int]) -> list[str]:
-    errors = []
-    if int(channels_df["leads"].sum()) != summary["Leads totales"]:
-        errors.append("La suma de leads por canal debe ser igual a Leads totales.")
-    if int(channels_df["citas"].sum()) != summary["Citas agendadas"]:
-        errors.append("La suma de citas por canal debe ser igual a Citas agendadas.")
-    if int(channels_df["pacientes"].sum()) != summary["Pacientes cerrados"]:
-        errors.append("La suma de pacientes por canal debe ser igual a Pacientes cerrados.")
-
-    expected_no_show = summary["Citas agendadas"] - summary["Citas asistidas"]
-    if summary["Citas no asistidas"] != expected_no_show:
-        errors.append("Citas no asistidas debe ser igual a Citas agendadas - Citas asistidas.")
-
-    if summary["Leads calificados"] > summary["Leads totales"]:
-        errors.append("Leads calificados no puede ser mayor que Leads totales.")
-    if summary["Citas asistidas"] > summary["Citas agendadas"]:
-        errors.append("Citas asistidas no puede ser mayor que Citas agendadas.")
-
-    return errors
+DERIVED_CACHE_SIZE = 8
+DEFAULT_TABLE = ChannelTable.from_frame(DEFAULT_CHANNELS)
+PAGE_SIZE = 25
+SORT_OPTIONS = {
+    "": "Orden original",
+    "Canal": "Canal",
+    "inversion": "Inversión",
+    "leads": "Leads",
+    "citas": "Citas",
+    "pacientes": "Pacientes",
+}
+
+
+def start_profile(kind: str = "app") -> RerunProfiler:
+    return RerunProfiler(PROFILE_ENV or (PROFILE_URL and st.query_params.get("debug") == "1"), kind)
+
+
+def finish_profile(profiler: RerunProfiler) -> dict | None:
+    if not profiler.enabled:
+        return None
+    ctx = get_script_run_ctx()
+    state = {k: v for k, v in st.session_state.items() if k != "_profiler"}
+    record = profiler.record(ctx.session_id if ctx else "", approx_size(state))
+    write_record(record)
+    st.session_state.pop("_profiler", None)
+    return record
+
+
+def fragment_rerun() -> bool:
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+# En un rerun completo la sección se mide dentro del perfil del script; si solo se reejecuta
+# el fragmento, se registra como un rerun propio. Un perfil que quedó en el estado porque el
+# rerun completo se interrumpió no cuenta en los reruns de fragmento.
+def profiled(name: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs) -> None:
+            if fragment_rerun():
+                st.session_state.pop("_profiler", None)
+            active = st.session_state.get("_profiler")
+            if active is not None:
+                with active.span(name):
+                    fn(*args, **kwargs)
+                return
+            profiler = start_profile(f"fragmento {name}")
+            try:
+                with profiler.span(name):
+                    fn(*args, **kwargs)
+            finally:
+                finish_profile(profiler)
+
+        return wrapper
+
+    return decorator
 
 
 def apply_theme() -> None:
-    st.markdown(
-        """
-        <style>
-        :root, html, body, [data-testid="stAppViewContainer"], .stApp {
-            color-scheme: dark !important;
-            --background-color: #0a1033 !important;
-            --secondary-background-color: #121843 !important;
-            --text-color: #f0f4ff !important;
-            --primary-color: #3f84ff !important;
-        }
-        .stApp { background-color: #0a1033 !important; color: #f0f4ff !important; }
-        .block-container { padding-top: 1.1rem; max-width: 1280px; }
-        [data-testid="stSidebar"] {
-            background-color: #101a4d !important;
-            border-right: 1px solid rgba(123, 162, 255, 0.25);
-        }
-        [data-testid="stSidebar"] * { color: #f0f4ff !important; }
-        [data-testid="stHeader"] {
-            background: #0a1033 !important;
-            border-bottom: 1px solid rgba(133, 177, 255, 0.15);
-        }
-        [data-testid="stToolbar"] {
-            background: #0a1033 !important;
-        }
-        [data-testid="stToolbar"] * {
-            color: #f0f4ff !important;
-        }
-
-        .stTextInput input,
-        .stNumberInput input,
-        [data-baseweb="input"] input,
-        [data-baseweb="input"] > div,
-        [data-baseweb="select"] > div,
-        textarea {
-            background-color: #121843 !important;
-            color: #ffffff !important;
-            border-color: rgba(133, 177, 255, 0.35) !important;
-        }
-
-        .stNumberInput button,
-        [data-testid="stNumberInputStepUp"],
-        [data-testid="stNumberInputStepDown"],
-        [data-testid="stNumberInput"] button {
-            background-color: #121843 !important;
-            color: #ffffff !important;
-            border: 1px solid rgba(133, 177, 255, 0.35) !important;
-        }
-
-        .stNumberInput input:disabled,
-        .stTextInput input:disabled,
-        input[disabled],
-        [data-baseweb="input"] input:disabled {
-            -webkit-text-fill-color: #ffffff !important;
-            color: #ffffff !important;
-            opacity: 1 !important;
-        }
-
-        [data-testid="stDataFrame"] [data-testid="stToolbar"],
-        [data-testid="stDataFrame"] [role="toolbar"],
-        [data-testid="stDataEditor"] [role="toolbar"] {
-            background-color: #121843 !important;
-            color: #ffffff !important;
-            border-bottom: 1px solid rgba(133, 177, 255, 0.25) !important;
-        }
-
-        [data-testid="stDataEditor"],
-        [data-testid="stDataEditor"] * {
-            background-color: #121843 !important;
-            color: #ffffff !important;
-            border-color: rgba(133, 177, 255, 0.25) !important;
-        }
-
-        .stDataFrame, .stTable, .stMarkdownTable {
-            background-color: #121843 !important;
-            color: #ffffff !important;
-            border-radius: 10px;
-        }
-        .stDataFrame [role="gridcell"],
-        .stDataFrame [role="columnheader"],
-        .stTable td,
-        .stTable th,
-        .stMarkdownTable td,
-        .stMarkdownTable th {
-            color: #ffffff !important;
-            background-color: #121843 !important;
-            border-color: rgba(133, 177, 255, 0.25) !important;
-        }
-        .module-card {
-            background: linear-gradient(145deg, #151d4f 0%, #121843 100%);
-            border: 1px solid rgba(133, 177, 255, 0.25);
-            border-radius: 12px;
-            padding: 12px 14px;
-            min-height: 105px;
-            box-shadow: 0 8px 20px rgba(7, 11, 35, 0.35);
-            margin-bottom: 10px;
-        }
-        .module-title {
-            color: #9fb4ff;
-            font-size: .82rem;
-            margin-bottom: 4px;
-            text-transform: uppercase;
-        }
-        .module-value { font-size: 1.9rem; font-weight: 700; color: #ffffff; }
-        .module-value.warning { color: #ffa63d; }
-        .module-value.danger { color: #ff4d4d; }
-        .module-note { color: #b7c6f6; font-size: .82rem; }
-        .section-box {
-            background: #121843;
-            border: 1px solid rgba(133, 177, 255, 0.2);
-            border-radius: 12px;
-            padding: 10px 12px;
-            margin: 8px 0 12px;
-        }
-        .section-box h3 { color: #eaf0ff; margin: 0; }
-        .roas-feedback {
-            background: #0f173f;
-            border: 1px solid rgba(133, 177, 255, 0.2);
-            border-radius: 10px;
-            padding: 10px 12px;
-            margin-top: 8px;
-            margin-bottom: 10px;
-            color: #f0f4ff;
-            line-height: 1.35;
-        }
-        .roas-note {
-            color: #9aa4c5;
-            font-size: 0.78rem;
-            margin-top: 8px;
-        }
-        .table-scroll {
-            width: 100%;
-            overflow-x: auto;
-            overflow-y: hidden;
-        }
-        .dark-table {
-            width: 100%;
-            min-width: 720px;
-            border-collapse: collapse;
-            background-color: #121843;
-            color: #ffffff;
-            border: 1px solid rgba(133, 177, 255, 0.25);
-            border-radius: 10px;
-            overflow: hidden;
-        }
-        .dark-table th, .dark-table td {
-            padding: 10px 12px;
-            border: 1px solid rgba(133, 177, 255, 0.20);
-            background-color: #121843;
-            color: #ffffff;
-            text-align: left;
-        }
-        .dark-table th {
-            background-color: #17215b;
-            color: #eaf0ff;
-            font-weight: 600;
-        }
-        </style>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(THEME_CSS, unsafe_allow_html=True)
 
 
 def module_card(title: str, value: str, note: str = "", value_class: str = "") -> None:
-    st.markdown(
-        f"""
-        <div class="module-card">
-            <div class="module-title">{title}</div>
-            <div class="module-value {value_class}">{value}</div>
-            <div class="module-note">{note}</div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    st.markdown(module_card_html(title, value, note, value_class), unsafe_allow_html=True)
+
+
+# Vista paginada y ordenable de una tabla de canales: devuelve las posiciones de la página
+# visible. Con hasta PAGE_SIZE filas no muestra controles.
+def page_view(table: ChannelTable, prefix: str) -> np.ndarray:
+    if len(table) <= PAGE_SIZE:
+        return np.arange(len(table))
+    pages = -(-len(table) // PAGE_SIZE)
+    if st.session_state.get(f"{prefix}_page", 1) > pages:
+        st.session_state[f"{prefix}_page"] = pages
+    sort_col, desc_col, page_col = st.columns([2, 1, 1])
+    sort = sort_col.selectbox("Ordenar por", list(SORT_OPTIONS), format_func=SORT_OPTIONS.get, key=f"{prefix}_sort")
+    descending = desc_col.toggle("Desc.", key=f"{prefix}_desc")
+    page = int(page_col.number_input("Página", min_value=1, max_value=pages, step=1, key=f"{prefix}_page"))
+    start = (page - 1) * PAGE_SIZE
+    st.caption(f"Filas {start + 1:,}–{min(start + PAGE_SIZE, len(table)):,} de {len(table):,}")
+    return table.order(sort, descending)[start : start + PAGE_SIZE]
 
 
 def init_state() -> None:
+    # Con DASHBOARD_SEED_DIR, las sesiones nuevas arrancan con los CSV de esa carpeta.
+    seed = load_seed(SEED_DIR) if SEED_DIR and "stage1_channels" not in st.session_state else None
+
     if "stage1_channels" not in st.session_state:
-        st.session_state.stage1_channels = DEFAULT_CHANNELS.copy()
-        st.session_state.stage1_signature = tuple(DEFAULT_CHANNELS[["leads", "citas", "pacientes"]].to_numpy().flatten())
+        st.session_state.stage1_channels = seed["channels"] if seed else DEFAULT_TABLE
+
+    if "stage1_digest" not in st.session_state:
+        st.session_state.stage1_digest = st.session_state.stage1_channels.counts_digest()
 
     if "company_name" not in st.session_state:
         st.session_state.company_name = ""
 
+    if "period" not in st.session_state:
+        st.session_state.period = current_period()
+
+    if "clinic_type" not in st.session_state:
+        st.session_state.clinic_type = ""
+
     if "stage2_summary" not in st.session_state:
-        st.session_state.stage2_summary = build_default_summary(st.session_state.stage1_channels)
+        st.session_state.stage2_summary = (
+            seed["summary"] if seed else build_default_summary(st.session_state.stage1_channels)
+        )
 
     if "stage3_projection" not in st.session_state:
-        st.session_state.stage3_projection = {"Ticket promedio": 300.0, "% recuperación": 50.0}
+        st.session_state.stage3_projection = {
+            "Ticket promedio": seed["ticket"] if seed else 300.0,
+            "% recuperación": 50.0,
+        }
 
     if "applied" not in st.session_state:
-        summary = copy.deepcopy(st.session_state.stage2_summary)
-        channels = st.session_state.stage1_channels.copy()
-        st.session_state.applied = {
-            "company": st.session_state.company_name,
-            "channels": channels,
-            "summary": summary,
-            "rates": compute_rates(summary),
-            "pipeline": compute_pipeline(summary),
-            "ticket": st.session_state.stage3_projection["Ticket promedio"],
-            "recovery": st.session_state.stage3_projection["% recuperación"],
-        }
+        st.session_state.applied = build_applied(st.session_state.stage1_channels, st.session_state.stage2_summary)
+
+    if "derived_cache" not in st.session_state:
+        st.session_state.derived_cache = LRUCache(DERIVED_CACHE_SIZE)
+
+    # Diagnóstico elegido en la página de cartera.
+    snapshot = st.session_state.pop("pending_snapshot", None)
+    if snapshot is not None:
+        load_snapshot(snapshot)
+        st.session_state.apply_notice = True
+
+
+def build_applied(channels: ChannelTable, summary: dict[str, int]) -> Diagnosis:
+    projection = st.session_state.stage3_projection
+    return Diagnosis(
+        st.session_state.company_name,
+        st.session_state.period,
+        channels,
+        summary,
+        projection["Ticket promedio"],
+        projection["% recuperación"],
+        st.session_state.clinic_type,
+    )
 
 
+@st.fragment
+@profiled("empresa")
 def stage_company() -> None:
-    st.sidebar.markdown("### Empresa")
-    company = st.sidebar.text_input("Nombre de la empresa", value=st.session_state.company_name, placeholder="Ej: Santa María")
+    st.markdown("### Empresa")
+    company = st.text_input("Nombre de la empresa", value=st.session_state.company_name, placeholder="Ej: Santa María")
     st.session_state.company_name = company.strip()
+    periods = recent_periods()
+    if st.session_state.period not in periods:
+        periods.append(st.session_state.period)
+    st.session_state.period = st.selectbox("Periodo", periods, index=periods.index(st.session_state.period))
+    types = ["", *CLINIC_TYPES]
+    if st.session_state.clinic_type not in types:
+        types.append(st.session_state.clinic_type)
+    st.session_state.clinic_type = st.selectbox(
+        "Tipo de clínica",
+        types,
+        index=types.index(st.session_state.clinic_type),
+        format_func=lambda t: t or "Sin especificar",
+    )
+
+    if not st.session_state.company_name:
+        return
+    history = get_history_store().company_history(st.session_state.company_name)
+    if history.empty:
+        return
+    with st.expander(f"Historial guardado ({len(history)} meses)"):
+        period = st.selectbox("Diagnóstico", history["period"].iloc[::-1], key="history_period")
+        if st.button("Cargar diagnóstico", use_container_width=True):
+            load_snapshot(row_to_snapshot(history[history["period"] == period].iloc[-1]))
+            st.session_state.apply_notice = True
+            st.rerun(scope="app")
+
+
+# Lo derivado de un archivo del CRM vale solo para el diagnóstico que se armó con ese archivo:
+# se guarda junto a la huella de los canales importados y se descarta al cargar otro
+# diagnóstico o al enviar una etapa 1 distinta.
+IMPORTED_STATE = ("rollup", "latency")
+
+
+def clear_import() -> None:
+    for name in (*IMPORTED_STATE, "imported_channels"):
+        st.session_state.pop(name, None)
+
+
+def imported(name: str, a: Diagnosis):
+    if st.session_state.get("imported_channels") != a.channels.digest():
+        return None
+    return st.session_state.get(name)
+
+
+def load_snapshot(snapshot: dict) -> None:
+    clear_import()
+    channels = ChannelTable.from_frame(snapshot["channels"])
+    st.session_state.company_name = snapshot["company"]
+    st.session_state.period = snapshot["period"]
+    st.session_state.clinic_type = snapshot["clinic_type"]
+    st.session_state.stage1_channels = channels
+    st.session_state.stage1_digest = channels.counts_digest()
+    st.session_state.stage2_summary = snapshot["summary"]
+    st.session_state.stage3_projection = {"Ticket promedio": snapshot["ticket"], "% recuperación": snapshot["recovery"]}
+    st.session_state.applied = build_applied(channels, snapshot["summary"])
+
+
+def stage_import() -> None:
+    with st.expander("Importar eventos del CRM (opcional)"):
+        st.caption(
+            "Archivo CSV o JSONL con un registro por lead: `canal`, `estado`, e `inversion` y `fecha` opcionales. "
+            "Con `fecha_cita`, `fecha_asistencia` o `fecha_cierre` se miden los tiempos entre etapas."
+        )
+        uploaded = st.file_uploader(
+            "Eventos de leads", type=["csv", "jsonl", "ndjson", "json", "gz"], label_visibility="collapsed"
+        )
+    if uploaded is None or uploaded.file_id == st.session_state.get("imported_file_id"):
+        return
+
+    latency = LatencyProfile()
+    rejected: dict[str, int] = {}
+    try:
+        channels, summary, daily = ingest_events_by_day(uploaded, latency=latency, rejected=rejected)
+    except ValueError as error:
+        st.error(str(error))
+        return
+
+    # Con fechas, el dashboard muestra ventanas móviles y anualiza con días reales.
+    clear_import()
+    if daily is not None:
+        rollup = Rollup()
+        rollup.append(daily)
+        st.session_state.rollup = rollup
+    if len(latency):
+        st.session_state.latency = latency
+
+    st.session_state.imported_file_id = uploaded.file_id
+    st.session_state.stage1_channels = ChannelTable.from_frame(channels)
+    st.session_state.imported_channels = st.session_state.stage1_channels.digest()
+    st.session_state.stage1_digest = st.session_state.stage1_channels.counts_digest()
+    st.session_state.stage2_summary = summary
+    st.success(f"Se importaron {summary['Leads totales']:,} leads en {len(channels)} canales.")
+    # "fecha" ya se contó al armar los conteos diarios; el perfil aporta las demás columnas.
+    for column, invalid in latency.invalid.items():
+        rejected.setdefault(column, invalid)
+    if rejected:
+        detail = ", ".join(f"{n:,} en `{column}`" for column, n in rejected.items())
+        st.warning(f"Fechas que no se pudieron interpretar (se esperaba formato ISO 8601): {detail}.")
 
 
 def stage1_form() -> None:
-    st.sidebar.markdown("### 1) Leads por canal")
-    st.sidebar.caption("Incluye gasto publicitario con valores sugeridos por canal.")
-    edited = st.sidebar.data_editor(
-        st.session_state.stage1_channels,
+    st.markdown("### 1) Leads por canal")
+    st.caption("Incluye gasto publicitario con valores sugeridos por canal.")
+    table = st.session_state.stage1_channels
+    positions = page_view(table, "stage1")
+    edited = st.data_editor(
+        table.frame(positions),
+        key="stage1_editor",
         hide_index=True,
         use_container_width=True,
-        num_rows="fixed",
-        disabled=["Canal"],
+        num_rows="dynamic",
         column_config={
             "inversion": st.column_config.NumberColumn(
                 "inversion", min_value=0.0, step=50.0, format="$ %.0f"
@@ -314,38 +329,39 @@ def stage1_form() -> None:
         },
     )
 
-    st.session_state.stage1_channels = edited.astype(
-        {"leads": int, "citas": int, "pacientes": int, "inversion": float}
-    )
-    new_signature = tuple(edited[["leads", "citas", "pacientes"]].to_numpy().flatten())
+    # Solo se reconstruye la tabla si el editor registró cambios en la página visible.
+    changes = st.session_state.get("stage1_editor") or {}
+    if any(changes.get(k) for k in ("edited_rows", "added_rows", "deleted_rows")):
+        table = table.apply_page_edits(positions, edited)
+        st.session_state.stage1_channels = table
 
-    if new_signature != st.session_state.stage1_signature:
-        st.session_state.stage2_summary = build_default_summary(st.session_state.stage1_channels)
-        st.session_state.stage1_signature = new_signature
-        st.sidebar.warning(
+    if table.counts_digest() != st.session_state.stage1_digest:
+        st.session_state.stage2_summary = build_default_summary(table)
+        st.session_state.stage1_digest = table.counts_digest()
+        st.warning(
             "Cambiaste la etapa 1, por eso se reinició la etapa 2 con valores sugeridos. Revísala antes de enviar."
         )
 
 
 def stage2_form() -> None:
-    st.sidebar.markdown("### 2) Resumen y pipeline ")
+    st.markdown("### 2) Resumen y pipeline ")
     s = st.session_state.stage2_summary
 
-    st.sidebar.caption("Leads totales, Citas agendadas y Pacientes cerrados se calculan automáticamente desde etapa 1.")
-    leads_totales = st.sidebar.number_input(
+    st.caption("Leads totales, Citas agendadas y Pacientes cerrados se calculan automáticamente desde etapa 1.")
+    leads_totales = st.number_input(
         "Leads totales (AUTOMÁTICO)", min_value=0, value=int(s["Leads totales"]), step=1, disabled=True
     )
-    leads_calificados = st.sidebar.number_input(
+    leads_calificados = st.number_input(
         "Leads calificados (MODIFICAR)", min_value=0, value=int(s["Leads calificados"]), step=1
     )
-    citas_agendadas = st.sidebar.number_input(
+    citas_agendadas = st.number_input(
         "Citas agendadas (AUTOMÁTICO)", min_value=0, value=int(s["Citas agendadas"]), step=1, disabled=True
     )
-    citas_asistidas = st.sidebar.number_input("Citas asistidas (MODIFICAR)", min_value=0, value=int(s["Citas asistidas"]), step=1)
-    citas_no_asistidas = st.sidebar.number_input(
+    citas_asistidas = st.number_input("Citas asistidas (MODIFICAR)", min_value=0, value=int(s["Citas asistidas"]), step=1)
+    citas_no_asistidas = st.number_input(
         "Citas no asistidas (MODIFICAR)", min_value=0, value=int(s["Citas no asistidas"]), step=1
     )
-    pacientes_cerrados = st.sidebar.number_input(
+    pacientes_cerrados = st.number_input(
         "Pacientes cerrados (AUTOMÁTICO)", min_value=0, value=int(s["Pacientes cerrados"]), step=1, disabled=True
     )
 
@@ -359,83 +375,323 @@ def stage2_form() -> None:
     }
 
 
+# La importación y las etapas 1 y 2 se reejecutan juntas: cambiar la etapa 1 reinicia la etapa 2.
+@st.fragment
+@profiled("etapas 1 y 2")
+def stage_channels_and_summary() -> None:
+    stage_import()
+    stage1_form()
+    stage2_form()
+
+
+@st.fragment
+@profiled("etapa 3")
 def stage3_form() -> None:
-    st.sidebar.markdown("### 3) Proyección de ingresos")
+    st.markdown("### 3) Proyección de ingresos")
     p = st.session_state.stage3_projection
-    ticket = st.sidebar.number_input("Ticket promedio ($)", min_value=0.0, value=float(p["Ticket promedio"]), step=10.0)
-    recovery = st.sidebar.number_input(
+    ticket = st.number_input("Ticket promedio ($)", min_value=0.0, value=float(p["Ticket promedio"]), step=10.0)
+    recovery = st.number_input(
         "% recuperación de no-shows", min_value=0.0, max_value=100.0, value=float(p["% recuperación"]), step=1.0
     )
 
     st.session_state.stage3_projection = {"Ticket promedio": float(ticket), "% recuperación": float(recovery)}
 
 
+@st.fragment
+@profiled("enviar")
 def apply_button() -> None:
-    st.sidebar.markdown("---")
-    st.sidebar.info("Al enviar, se valida la coherencia de todos los datos ingresados.")
-    if st.sidebar.button("Enviar", type="primary", use_container_width=True):
+    st.markdown("---")
+    st.info("Al enviar, se valida la coherencia de todos los datos ingresados.")
+    if st.button("Enviar", type="primary", use_container_width=True):
         summary = st.session_state.stage2_summary
         channels = st.session_state.stage1_channels
         errors = validate_consistency(channels, summary)
         if errors:
             for error in errors:
-                st.sidebar.error(error)
+                st.error(error)
             return
 
-        st.session_state.applied = {
-            "company": st.session_state.company_name,
-            "channels": channels.copy(),
-            "summary": copy.deepcopy(summary),
-            "rates": compute_rates(summary),
-            "pipeline": compute_pipeline(summary),
-            "ticket": st.session_state.stage3_projection["Ticket promedio"],
-            "recovery": st.session_state.stage3_projection["% recuperación"],
-        }
-        st.sidebar.success("Dashboard actualizado correctamente.")
+        st.session_state.applied = build_applied(channels, summary)
+        if channels.digest() != st.session_state.get("imported_channels"):
+            clear_import()
+        if st.session_state.company_name:
+            get_history_store().record(st.session_state.applied)
+            get_peer_index().sync(get_history_store(), force=True)
+        st.session_state.apply_notice = True
+        # Solo un envío válido redibuja el dashboard; el resto de la barra lateral se reejecuta por fragmentos.
+        st.rerun(scope="app")
+
+    if st.session_state.pop("apply_notice", False):
+        st.success("Dashboard actualizado correctamente.")
+
+
+# Elegir otro canal solo reejecuta este fragmento.
+@st.fragment
+@profiled("tiempos entre etapas")
+def stage_latency(profile: LatencyProfile) -> None:
+    st.markdown('<div class="section-box"><h3>Tiempos entre etapas</h3></div>', unsafe_allow_html=True)
+    channel = st.selectbox(
+        "Canal", [None, *profile.channels], format_func=lambda c: c or "Todos los canales", key="latency_channel"
+    )
+    st.table(latency_table(profile, channel))
+    st.bar_chart(profile.histogram(channel), stack=False)
+    note = "P50 y P90 desde las fechas de los eventos importados, con error relativo de hasta 1%."
+    if profile.skipped:
+        note += f" {profile.skipped:,} etapas con fecha de fin anterior a la de inicio no se cuentan."
+    st.caption(note)
+
+
+@st.fragment
+@profiled("monte carlo")
+def stochastic_projection(a: Diagnosis, history: pd.DataFrame | None) -> None:
+    if not st.toggle("Proyección estocástica (P10 / P50 / P90)", key="montecarlo_mode"):
+        return
+    seed = int(st.number_input("Semilla", min_value=0, value=42, step=1, key="montecarlo_seed"))
+    params = fit_projection(a.summary, a.ticket, a.recovery, history)
+    key = content_hash(("montecarlo", params, seed))
+    bands = st.session_state.derived_cache.get_or_compute(key, lambda: simulate_recoverable(params, seed=seed))
+
+    for horizon, title in (("mensual", "Potencial recuperable"), ("anual", "Potencial recuperable anual")):
+        p10, p50, p90 = bands[horizon]
+        module_card(f"{title} (P50)", f"${p50:,.0f}", f"P10 ${p10:,.0f} · P90 ${p90:,.0f}")
+    source = f"ajustadas a {params['months']:.0f} meses del historial" if params["months"] else "por defecto"
+    st.caption(
+        f"{MC_SIMULATIONS:,} simulaciones por horizonte con dispersiones {source}: no-shows "
+        f"{'binomial negativa' if params['no_show_r'] else 'Poisson'}, ticket lognormal y recuperación beta."
+    )
 
 
-apply_theme()
-init_state()
-st.sidebar.header("Formulario secuencial")
-st.sidebar.caption("Completa las 3 etapas en la misma página y presiona Enviar para conocer la eficiencia comercial de tu clínica.")
-stage_company()
-stage1_form()
-stage2_form()
-stage3_form()
-apply_button()
+# Los controles de escenarios solo reejecutan este fragmento: el resto del dashboard no se redibuja.
+@st.fragment
+@profiled("escenarios")
+def scenario_explorer(base: dict[str, float]) -> None:
+    st.markdown('<div class="section-box"><h3>Escenarios what-if</h3></div>', unsafe_allow_html=True)
+    if not st.toggle("Explorar escenarios de ticket, recuperación, show rate y cierre", key="scenario_mode"):
+        return
 
-a = st.session_state.applied
-channels_df = a["channels"].copy()
-summary = a["summary"]
-rates = a["rates"]
-pipeline_df = a["pipeline"]
+    axes = list(SCENARIO_AXES)
+    c1, c2, c3, c4 = st.columns(4)
+    x_axis = c1.selectbox("Eje horizontal", axes, format_func=SCENARIO_AXES.get, key="scenario_x")
+    y_axis = c2.selectbox(
+        "Eje vertical", [axis for axis in axes if axis != x_axis], format_func=SCENARIO_AXES.get, key="scenario_y"
+    )
+    metric = c3.selectbox("Métrica", list(SCENARIO_METRICS), format_func=SCENARIO_METRICS.get, key="scenario_metric")
+    steps = c4.select_slider("Resolución", [50, 100, 250, MAX_GRID_STEPS], value=100, key="scenario_steps")
+
+    grids = {}
+    for column, axis in zip(st.columns(2), (x_axis, y_axis)):
+        lo, hi = axis_range(axis, base)
+        limit = max(hi * 2, 100.0) if axis == "ticket" else 100.0
+        low, high = column.slider(f"Rango: {SCENARIO_AXES[axis]}", 0.0, limit, (lo, hi), key=f"scenario_range_{axis}")
+        grids[axis] = np.linspace(low, high, steps)
+
+    z = sweep(base, grids)[metric]
+    st.plotly_chart(
+        build_scenario_heatmap(
+            grids[x_axis].round(2),
+            grids[y_axis].round(2),
+            z.round(2),
+            (SCENARIO_AXES[x_axis], SCENARIO_AXES[y_axis], SCENARIO_METRICS[metric]),
+            (base[x_axis], base[y_axis]),
+        ),
+        use_container_width=True,
+    )
+    st.caption(
+        f"{z.size:,} escenarios. Las variables no barridas quedan en su valor actual; "
+        "las citas agendadas y la inversión se mantienen fijas."
+    )
 
-company = a.get("company", "").strip()
-title_company = company if company else "Tu Empresa"
+    st.markdown(f"**Sensibilidad de {SCENARIO_METRICS[metric]} a cada variable (±50%)**")
+    st.line_chart(sensitivity(base, metric))
+
+
+def budget_plan(channels: ChannelTable, ticket: float, elasticity: float, budget: float) -> dict:
+    curves = response_curves(channels, ticket, elasticity)
+    budgets = np.array([budget])
+    levels = np.linspace(0.0, 2 * max(budget, float(curves["spend"].sum())), BUDGET_LEVELS)
+    return {
+        "table": allocation_table(channels.names, curves, budget),
+        "curve": budget_curve(curves, levels),
+        "actual": float(curve_revenue(curves, proportional(curves, budgets))[0]),
+        "optimal": float(curve_revenue(curves, optimize(curves, budgets))[0]),
+    }
 
-ticket_promedio = float(a["ticket"])
-recovery_pct = float(a["recovery"])
 
-total_inversion = float(channels_df["inversion"].sum())
-total_leads = int(summary["Leads totales"])
-total_ventas = int(summary["Pacientes cerrados"])
+# Los controles del optimizador solo reejecutan este fragmento.
+@st.fragment
+@profiled("presupuesto")
+def budget_optimizer(channels: ChannelTable, ticket: float) -> None:
+    st.markdown('<div class="section-box"><h3>Reparto de la inversión</h3></div>', unsafe_allow_html=True)
+    if not st.toggle("Optimizar el reparto del presupuesto entre canales", key="budget_mode"):
+        return
+    paid = channels.inversion > 0
+    if not (channels["pacientes"][paid] > 0).any():
+        st.caption("Se necesita al menos un canal con inversión y pacientes cerrados.")
+        return
+
+    c1, c2 = st.columns(2)
+    elasticity = c1.slider(
+        "Elasticidad (rendimientos decrecientes)",
+        0.3,
+        0.95,
+        DEFAULT_ELASTICITY,
+        0.05,
+        key="budget_elasticity",
+        help="Con 0.7, duplicar la inversión de un canal multiplica sus pacientes por 2^0.7 ≈ 1.6.",
+    )
+    budget = c2.number_input(
+        "Presupuesto total ($)", min_value=0.0, value=float(channels.inversion.sum()), step=100.0, key="budget_total"
+    )
+    key = content_hash(("presupuesto", channels.digest(), ticket, elasticity, budget))
+    plan = st.session_state.derived_cache.get_or_compute(
+        key, lambda: budget_plan(channels, ticket, elasticity, budget)
+    )
 
-cpl = total_inversion / total_leads if total_leads > 0 else 0.0
-cpa = total_inversion / total_ventas if total_ventas > 0 else 0.0
+    m1, m2 = st.columns(2)
+    with m1:
+        module_card("Facturación con el reparto actual", f"${plan['actual']:,.0f}", "Misma proporción por canal")
+    with m2:
+        module_card(
+            "Facturación con el reparto óptimo",
+            f"${plan['optimal']:,.0f}",
+            f"+${plan['optimal'] - plan['actual']:,.0f} con el mismo presupuesto",
+        )
+    money = st.column_config.NumberColumn(format="$ %.0f")
+    st.dataframe(
+        plan["table"],
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Inversión actual": money,
+            "Inversión óptima": money,
+            "Cambio": st.column_config.NumberColumn(format="$ %+.0f"),
+            "Ingreso por $1 adicional": st.column_config.NumberColumn(format="$ %.2f"),
+            "Facturación proyectada": money,
+        },
+    )
+    st.markdown("**Facturación según el presupuesto total**")
+    st.line_chart(plan["curve"])
+    st.caption(
+        "Cada canal con inversión sigue una curva de rendimientos decrecientes que pasa por sus pacientes "
+        "actuales (tasa de cierre / CPL). El reparto óptimo iguala el ingreso del último dólar en todos "
+        "los canales. Los canales sin inversión mantienen sus pacientes."
+    )
 
-facturacion_actual = total_ventas * ticket_promedio
-roas = facturacion_actual / total_inversion if total_inversion > 0 else 0.0
 
-no_shows = int(summary["Citas no asistidas"])
-potencial_recuperable = int(no_shows * (recovery_pct / 100) * ticket_promedio)
-dinero_perdido = int(no_shows * ticket_promedio)
-potencial_recuperable_anual = potencial_recuperable * 12
-dinero_perdido_anual = dinero_perdido * 12
+# Solo la página visible se convierte a HTML; cambiar de página reejecuta solo este fragmento.
+@st.fragment
+@profiled("tabla canales")
+def channels_table(channels: ChannelTable) -> None:
+    positions = page_view(channels, "tabla")
+    view = () if len(channels) <= PAGE_SIZE else tuple(positions.tolist())
+    table_html = cached_channels_table(table_key(channels, view), channels, positions)
+    st.markdown(f'<div class="table-scroll">{table_html}</div>', unsafe_allow_html=True)
+
+
+def peer_note(index: PeerIndex, roas: float, segment: str) -> str:
+    percentile = index.percentile("roas", roas, segment)
+    if percentile is None:
+        return ""
+    q25, _, q75 = index.quantiles("roas", segment)
+    group = f"clínicas de tipo {segment}" if segment else "clínicas de la cartera"
+    return (
+        f"Tu ROAS supera al {percentile:.0f}% de {index.count('roas', segment):,} {group}; "
+        f"la mitad central está entre {q25:.2f}x y {q75:.2f}x."
+    )
 
-channels_df["Conv. cita %"] = channels_df.apply(lambda row: format_percentage(row["citas"], row["leads"]), axis=1)
-channels_df["Conv. cierre %"] = channels_df.apply(
-    lambda row: format_percentage(row["pacientes"], row["citas"]), axis=1
-)
+
+def derive_dashboard(a: Diagnosis, rules) -> dict:
+    summary = a.summary
+    rates = a.rates
+    kpis = compute_kpis(a.channels, summary, a.ticket, a.recovery)
+    diagnosis = rules.diagnose(kpis, rates)
+    return {
+        "rates": rates,
+        "kpis": kpis,
+        "roas_feedback": diagnosis["feedback_roas"],
+        "oportunidad_html": diagnosis["oportunidad"]["mensaje"].replace("\n", "<br>"),
+        "funnel_key": funnel_key(summary),
+        "bottlenecks_key": bottlenecks_key(rates),
+    }
+
+
+# Editar data/reglas.json cambia rules.key y, con ella, la entrada de caché.
+def get_derived(a: Diagnosis) -> dict:
+    rules = load_rules()
+    key = content_hash((a.key, rules.key))
+    return st.session_state.derived_cache.get_or_compute(key, lambda: derive_dashboard(a, rules))
+
+
+profiler = start_profile()
+st.session_state.pop("_profiler", None)
+if profiler.enabled:
+    st.session_state._profiler = profiler
+with profiler.span("apply_theme"):
+    apply_theme()
+with profiler.span("init_state"):
+    init_state()
+with st.sidebar:
+    st.header("Formulario secuencial")
+    st.caption("Completa las 3 etapas en la misma página y presiona Enviar para conocer la eficiencia comercial de tu clínica.")
+    stage_company()
+    stage_channels_and_summary()
+    stage3_form()
+    apply_button()
+
+a = st.session_state.applied
+with profiler.span("kpis"):
+    derived = get_derived(a)
+summary = a.summary
+rates = derived["rates"]
+
+company = a.company.strip()
+title_company = company if company else "Tu Empresa"
+
+recovery_pct = a.recovery
+
+kpis = derived["kpis"]
+total_inversion = kpis["total_inversion"]
+total_leads = kpis["total_leads"]
+total_ventas = kpis["total_ventas"]
+cpl = kpis["cpl"]
+cpa = kpis["cpa"]
+facturacion_actual = kpis["facturacion_actual"]
+roas = kpis["roas"]
+no_shows = kpis["no_shows"]
+potencial_recuperable = kpis["potencial_recuperable"]
+dinero_perdido = kpis["dinero_perdido"]
+potencial_recuperable_anual = kpis["potencial_recuperable_anual"]
+dinero_perdido_anual = kpis["dinero_perdido_anual"]
+potencial_anual_note = "Potencial recuperable x 12"
+dinero_anual_note = "Dinero perdido x 12"
+
+with profiler.span("historial"):
+    history = get_history_store().company_history(company) if company else None
+with profiler.span("pares"):
+    peer_index = get_peer_index()
+    peer_index.sync(get_history_store())
+    peer_segment = peer_index.segment_for(a.clinic_type)
+    # Con suficientes pares, la tasa de cierre se marca frente a P25 y la mediana de la cartera.
+    close_thresholds = peer_index.quantiles("tasa_cierre", peer_segment, (25, 50)) or CLOSE_RATE_THRESHOLDS
+rollup = imported("rollup", a)
+with profiler.span("ventanas"):
+    windows = rollup.report("", a.ticket, a.recovery) if rollup is not None else None
+if windows is not None:
+    year = windows.loc["365 días"]
+    potencial_recuperable_anual = year["Potencial recuperable anual"]
+    dinero_perdido_anual = year["Dinero perdido anual"]
+    covered = int(year["Días con datos"])
+    if covered >= 365:
+        potencial_anual_note = dinero_anual_note = "Últimos 365 días de eventos importados"
+    else:
+        potencial_anual_note = dinero_anual_note = f"{covered} días de eventos importados x 365/{covered}"
+elif history is not None and len(history) > 1:
+    potencial_recuperable_anual, months = trailing_annual(history, "potencial_recuperable")
+    dinero_perdido_anual, _ = trailing_annual(history, "dinero_perdido")
+    if months == 12:
+        potencial_anual_note = dinero_anual_note = "Suma de los últimos 12 meses reales"
+    else:
+        potencial_anual_note = dinero_anual_note = f"Promedio de {months} meses registrados x 12"
 
 st.title(f"Dashboard  de Eficiencia Comercial y Retorno de Inversión (ROI) para {title_company}")
 st.caption("Flujo en 3 etapas: canales → resumen/pipeline → proyección, con validaciones cruzadas.")
@@ -468,51 +724,27 @@ with r3:
 with r4:
     module_card("Asistencia → Cierre", f"{rates['Asistencia → Cierre']:.1f}%", "Calculado automáticamente")
 with r5:
-    close_class = ""
-    if rates["Tasa de cierre real"] < 35:
-        close_class = "danger"
-    elif rates["Tasa de cierre real"] < 50:
-        close_class = "warning"
-    module_card("Tasa de cierre real", f"{rates['Tasa de cierre real']:.1f}%", "Ventas / Leads", close_class)
+    module_card(
+        "Tasa de cierre real",
+        f"{rates['Tasa de cierre real']:.1f}%",
+        "Ventas / Leads",
+        close_rate_class(rates["Tasa de cierre real"], close_thresholds),
+    )
 
 left, right = st.columns([1.4, 1])
 
 with left:
     st.markdown('<div class="section-box"><h3>Pipeline </h3></div>', unsafe_allow_html=True)
-    fig_pipeline = px.funnel(
-        pipeline_df,
-        x="Cantidad",
-        y="Etapa",
-        color="Etapa",
-        color_discrete_sequence=px.colors.sequential.Blues_r,
-    )
-    fig_pipeline.update_layout(
-        paper_bgcolor="#121843",
-        plot_bgcolor="#121843",
-        font=dict(color="#ffffff"),
-        margin=dict(l=10, r=10, t=10, b=10),
-        legend_title_text="",
-        legend=dict(font=dict(color="#ffffff"), title=dict(font=dict(color="#ffffff"))),
-    )
-    fig_pipeline.update_traces(textfont=dict(color="#ffffff"))
-    fig_pipeline.update_xaxes(tickfont=dict(color="#ffffff"), title_font=dict(color="#ffffff"))
-    fig_pipeline.update_yaxes(tickfont=dict(color="#ffffff"), title_font=dict(color="#ffffff"))
-    st.plotly_chart(fig_pipeline, use_container_width=True)
+    with profiler.span("embudo"):
+        fig_pipeline = cached_funnel_figure(derived["funnel_key"], summary)
+        st.plotly_chart(fig_pipeline, use_container_width=True)
 
 with right:
     st.markdown('<div class="section-box"><h3>Cuellos de botella</h3></div>', unsafe_allow_html=True)
-    bottlenecks = pd.DataFrame(
-        {
-            "Etapa": ["Lead → Cita", "Cita → Asistencia", "Asistencia → Cierre", "Cierre real"],
-            "Conversión": [
-                f"{rates['Lead → Cita']:.1f}%",
-                f"{rates['Show rate']:.1f}%",
-                f"{rates['Asistencia → Cierre']:.1f}%",
-                f"{rates['Tasa de cierre real']:.1f}%",
-            ],
-        }
-    )
-    st.table(bottlenecks)
+    st.table(cached_bottlenecks(derived["bottlenecks_key"], rates))
+    latency = imported("latency", a)
+    if latency is not None:
+        stage_latency(latency)
 
     st.markdown('<div class="section-box"><h3>Facturación y ROAS</h3></div>', unsafe_allow_html=True)
     module_card("Facturación actual", f"${facturacion_actual:,.0f}", "Ventas x Ticket promedio")
@@ -526,49 +758,38 @@ with right:
     with p2:
         module_card("Potencial Recuperable", f"${potencial_recuperable:,.0f}", f"{recovery_pct:.0f}% de recuperación")
     module_card("Dinero perdido", f"${dinero_perdido:,.0f}", "No-shows x Ticket promedio")
-    module_card("Potencial recuperable anual", f"${potencial_recuperable_anual:,.0f}", "Potencial recuperable x 12")
-    module_card("Dinero perdido anual", f"${dinero_perdido_anual:,.0f}", "Dinero perdido x 12")
+    module_card("Potencial recuperable anual", f"${potencial_recuperable_anual:,.0f}", potencial_anual_note)
+    module_card("Dinero perdido anual", f"${dinero_perdido_anual:,.0f}", dinero_anual_note)
+    stochastic_projection(a, history)
+
+if history is not None and len(history) > 1:
+    st.markdown('<div class="section-box"><h3>Tendencia mensual</h3></div>', unsafe_allow_html=True)
+    st.line_chart(
+        history.set_index("period")[["facturacion_actual", "dinero_perdido", "potencial_recuperable"]].rename(
+            columns={
+                "facturacion_actual": "Facturación",
+                "dinero_perdido": "Dinero perdido",
+                "potencial_recuperable": "Potencial recuperable",
+            }
+        )
+    )
+
+if windows is not None:
+    st.markdown('<div class="section-box"><h3>Ventanas móviles (eventos importados)</h3></div>', unsafe_allow_html=True)
+    st.dataframe(windows.T.style.format("{:,.2f}"), use_container_width=True)
+    st.caption(
+        f"Ventanas que terminan el {pd.Timestamp(rollup.last_day, unit='D'):%Y-%m-%d}, último día con eventos. "
+        "Los montos anuales usan los últimos 365 días o, con menos historia, los días disponibles x 365."
+    )
 
 st.markdown('<div class="section-box"><h3>Leads por canal + conversiones</h3></div>', unsafe_allow_html=True)
-table_html = channels_df.to_html(index=False, classes="dark-table", border=0)
-st.markdown(f'<div class="table-scroll">{table_html}</div>', unsafe_allow_html=True)
+channels_table(a.channels)
 
 
 # Bloques finales: Feedback + Oportunidad Estratégica
-if roas < 2:
-    roas_title = "Diagnóstico Crítico"
-    roas_body = (
-        "Tu costo de adquisición es alto. Estás recuperando menos de $2 por cada $1 invertido. "
-        "Revisa urgentemente tu tasa de cierre y la calidad de tus leads."
-    )
-    roas_note = "El promedio saludable en clínicas estéticas se encuentra entre 3 y 5."
-elif roas <= 5:
-    roas_title = "Diagnóstico Estable"
-    roas_body = (
-        "Tu clínica es rentable, pero existen fugas operativas. Optimizar la confirmación y "
-        "recuperación de citas podría aumentar tu facturación sin incrementar la inversión publicitaria."
-    )
-    roas_note = "Tu rentabilidad está dentro del rango promedio saludable del sector."
-else:
-    roas_title = "Diagnóstico Excelente"
-    roas_body = (
-        "Tu modelo comercial es altamente eficiente. Existe margen suficiente para escalar la "
-        "inversión publicitaria con bajo riesgo."
-    )
-    roas_note = "Estás por encima del promedio habitual del sector (3–5)."
-
-if roas > 5 and rates["No-Show rate"] > 20:
-    oportunidad_texto = "Tu marketing funciona. Tu sistema de confirmación no."
-elif roas < 2:
-    oportunidad_texto = "Antes de escalar publicidad, necesitas optimizar cierre y recuperación."
-elif dinero_perdido > 0:
-    oportunidad_texto = (
-        "Tu clínica no tiene un problema de demanda.\n"
-        "Tiene un problema de eficiencia operativa.\n"
-        "Si corriges las fugas actuales, podrías aumentar tu facturación sin invertir un dólar adicional en publicidad."
-    )
-else:
-    oportunidad_texto = "No se detectan fugas operativas relevantes con los datos actuales."
+roas_feedback = derived["roas_feedback"]
+roas_title, roas_body = roas_feedback["titulo"], roas_feedback["cuerpo"]
+roas_note = peer_note(peer_index, roas, peer_segment) or roas_feedback["nota"]
 
 st.markdown('<div class="section-box"><h3>Feedback ROAS</h3></div>', unsafe_allow_html=True)
 st.markdown(
@@ -583,17 +804,52 @@ st.markdown(
 )
 
 st.markdown('<div class="section-box"><h3>Oportunidad Estratégica Detectada</h3></div>', unsafe_allow_html=True)
-oportunidad_html = oportunidad_texto.replace("\n", "<br>")
 st.markdown(
     f"""
     <div class="roas-feedback">
-        {oportunidad_html}
+        {derived["oportunidad_html"]}
     </div>
     """,
     unsafe_allow_html=True,
 )
 
+peer_table = peer_index.compare(clinic_values(kpis, rates, summary), peer_segment)
+if not peer_table.empty:
+    st.markdown('<div class="section-box"><h3>Comparación con clínicas similares</h3></div>', unsafe_allow_html=True)
+    if a.clinic_type and not peer_segment:
+        st.caption(f"Aún hay pocas clínicas de tipo {a.clinic_type}: se compara con toda la cartera.")
+    st.dataframe(
+        peer_table,
+        hide_index=True,
+        use_container_width=True,
+        column_config={c: st.column_config.NumberColumn(format="%.2f") for c in ("Tu clínica", "P25", "Mediana", "P75")},
+    )
+
+scenario_explorer(scenario_base(summary, a.ticket, a.recovery, total_inversion))
+budget_optimizer(a.channels, a.ticket)
+
+st.page_link("pages/cartera.py", label="Ver la cartera de clínicas")
+
 st.markdown("---")
+cache_stats = st.session_state.derived_cache.stats()
+st.caption(
+    f"Caché de cálculos: {cache_stats['hits']} aciertos / {cache_stats['misses']} fallos en esta sesión · "
+    f"{PROCESS_STATS.hits} / {PROCESS_STATS.misses} en el servidor · "
+    f"caché de render compartido: {RENDER_CACHE.hits} aciertos, {RENDER_CACHE.current_bytes / 1024:,.0f} KB."
+)
+
+profile_record = finish_profile(profiler)
+if profile_record is not None:
+    with st.expander(f"Depuración: rerun en {profile_record['total_ms']:.1f} ms"):
+        st.caption(
+            f"Sesión {profile_record['session_id']} · estado de sesión ≈ {profile_record['state_bytes'] / 1024:,.1f} KB · "
+            f"registro en {PROFILE_LOG}"
+        )
+        st.dataframe(
+            pd.DataFrame(profile_record["spans"].items(), columns=["Sección", "ms"]).sort_values("ms", ascending=False),
+            hide_index=True,
+            use_container_width=True,
+        )
 
 
 
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import parser, percentile, report
+from kpis import DEFAULT_CHANNELS, build_default_summary
+
+# Prueba de carga de api.py: levanta el servidor en otro proceso y lo satura con conexiones
+# keep-alive concurrentes, cada una enviando POST /score en serie.
+#
+#   python -m benchmarks.bench_api [--save | --compare] [--requests 20000] [--connections 16 64]
+#
+# El cliente corre en la misma máquina: en pocos núcleos compite con el servidor por la CPU y
+# el resultado es una cota inferior del throughput.
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PAYLOAD = json.dumps(
+    {
+        "clinic_id": "bench",
+        "company": "Clínica",
+        "ticket": 300.0,
+        "recovery": 50.0,
+        "summary": build_default_summary(DEFAULT_CHANNELS),
+        "channels": DEFAULT_CHANNELS.to_dict(orient="records"),
+    }
+).encode()
+
+REQUEST = (
+    b"POST /score HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+    + f"Content-Length: {len(PAYLOAD)}\r\n\r\n".encode()
+    + PAYLOAD
+)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "api.py", "--port", str(port)], cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    server.stdout.readline()  # espera al mensaje de arranque
+    return server
+
+
+async def read_response(reader: asyncio.StreamReader) -> bytes:
+    head = await reader.readuntil(b"\r\n\r\n")
+    length = int(head.split(b"Content-Length: ", 1)[1].split(b"\r\n", 1)[0])
+    return await reader.readexactly(length)
+
+
+async def connection(port: int, count: int, latencies: list[float]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for _ in range(count):
+        started = time.perf_counter()
+        writer.write(REQUEST)
+        await read_response(reader)
+        latencies.append(time.perf_counter() - started)
+    writer.close()
+
+
+async def load(port: int, requests: int, connections: int) -> dict:
+    latencies: list[float] = []
+    per_connection = requests // connections
+    started = time.perf_counter()
+    await asyncio.gather(*(connection(port, per_connection, latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        "median_s": statistics.median(latencies),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "rps": len(latencies) / elapsed,
+        "requests": len(latencies),
+    }
+
+
+def main() -> int:
+    p = parser("Prueba de carga de la API de puntuación")
+    p.add_argument("--requests", type=int, default=20_000)
+    p.add_argument("--connections", type=int, nargs="+", default=[16, 64])
+    args = p.parse_args()
+
+    port = free_port()
+    server = start_server(port)
+    try:
+        asyncio.run(load(port, 1_000, 8))  # calentamiento
+        results = {f"{c} conexiones": asyncio.run(load(port, args.requests, c)) for c in args.connections}
+    finally:
+        server.terminate()
+        server.wait()
+    return report("api", results, args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import copy
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.bench_compute import channel_table
+from benchmarks.common import parser, percentile, report
+from state import ChannelTable
+
+# Latencia de rerun de extremo a extremo y memoria pico con el arnés sin interfaz de Streamlit:
+#
+#   python -m benchmarks.bench_app [--save | --compare] [--runs 10]
+#
+# AppTest siempre reejecuta el script completo (no respeta los fragmentos), por lo que mide
+# el peor caso de cada interacción.
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / "app.py")
+
+
+def new_app():
+    from streamlit.testing.v1 import AppTest
+
+    return AppTest.from_file(APP_PATH, default_timeout=60)
+
+
+def timed_run(action: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    at = action()
+    elapsed = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return elapsed
+
+
+def peak_memory(action: Callable[[], object]) -> float:
+    # Pasada aparte: tracemalloc ralentiza la ejecución y distorsionaría los tiempos.
+    tracemalloc.start()
+    action()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def state_footprint(at) -> float:
+    # Memoria retenida por el estado de sesión: lo que ocupa una copia profunda del estado
+    # (la primera copia calienta cachés internas de copy y no se mide).
+    state = dict(at.session_state._state.filtered_state)
+    copy.deepcopy(state)
+    tracemalloc.start()
+    clone = copy.deepcopy(state)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del clone
+    return size / 1024
+
+
+def edit_stage1_cell(at):
+    # st.data_editor no es editable desde AppTest: se sustituye la tabla de la etapa 1, que
+    # recorre el mismo camino que una edición (cambio de firma y reinicio de la etapa 2).
+    channels = at.session_state.stage1_channels.frame()
+    channels.loc[0, "leads"] += 1
+    at.session_state.stage1_channels = ChannelTable.from_frame(channels)
+    return at.run()
+
+
+def with_channels(rows: int):
+    # Tabla de campañas grande: la latencia del rerun no debe crecer con el número de filas.
+    def setup(at):
+        at.session_state.stage1_channels = ChannelTable.from_frame(channel_table(rows))
+        return at.run()
+
+    return setup
+
+
+def send(at):
+    return next(b for b in at.sidebar.button if b.label == "Enviar").click().run()
+
+
+SCENARIOS = {
+    "primera carga": (lambda at: None, lambda at: at.run()),
+    "rerun sin cambios": (lambda at: at.run(), lambda at: at.run()),
+    "editar nombre de empresa": (lambda at: at.run(), lambda at: at.sidebar.text_input[0].input("Clínica").run()),
+    "editar celda etapa 1": (lambda at: at.run(), edit_stage1_cell),
+    "editar etapa 2": (lambda at: at.run(), lambda at: at.sidebar.number_input[1].set_value(230).run()),
+    "enviar": (lambda at: at.run(), send),
+    "rerun sin cambios [5,000 canales]": (with_channels(5_000), lambda at: at.run()),
+    "editar celda etapa 1 [5,000 canales]": (with_channels(5_000), edit_stage1_cell),
+}
+
+
+def run(runs: int) -> dict[str, dict]:
+    results = {}
+    for name, (setup, action) in SCENARIOS.items():
+        timings = []
+        for _ in range(runs):
+            at = new_app()
+            setup(at)
+            timings.append(timed_run(lambda: action(at)))
+        at = new_app()
+        setup(at)
+        results[name] = {
+            "median_s": statistics.median(timings),
+            "p95_s": percentile(timings, 95),
+            "min_s": min(timings),
+            "peak_mb": peak_memory(lambda: action(at)),
+            "state_kb": state_footprint(at),
+            "runs": runs,
+        }
+    return results
+
+
+def main() -> int:
+    p = parser("Latencia de rerun de app.py con AppTest")
+    p.add_argument("--runs", type=int, default=10)
+    args = p.parse_args()
+    os.environ.setdefault("DASHBOARD_HISTORY_DB", str(Path(tempfile.mkdtemp()) / "historial.sqlite"))
+    return report("app", run(args.runs), args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import functools
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import measure, parser, report
+from budget import optimize, response_curves
+from datasets import load_channels, read_bottlenecks, read_channels
+from ingest import channel_column
+from kpis import (
+    DEFAULT_CHANNELS,
+    SUMMARY_KEYS,
+    add_channel_conversions,
+    build_default_summary,
+    compute_kpis,
+    compute_pipeline,
+    compute_rates,
+    score_clinics,
+    validate_batch,
+    validate_consistency,
+)
+from latency import LatencyProfile
+from montecarlo import fit_projection, simulate_recoverable
+from peers import CLINIC_TYPES, PeerIndex
+from portfolio import PAGE_SIZE, Portfolio
+from rollups import Rollup
+from rules import load_rules
+from scenarios import MAX_GRID_STEPS, scenario_base, sensitivity, sweep
+
+# Microbenchmarks de las funciones de cálculo:
+#
+#   python -m benchmarks.bench_compute [--save | --compare]
+
+
+def channel_table(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    leads = rng.integers(0, 500, rows)
+    citas = rng.integers(0, leads + 1)
+    return pd.DataFrame(
+        {
+            "Canal": [f"Campaña {i}" for i in range(rows)],
+            "inversion": rng.integers(0, 5000, rows).astype(float),
+            "leads": leads,
+            "citas": citas,
+            "pacientes": rng.integers(0, citas + 1),
+        }
+    )
+
+
+def portfolio(clinics: int, channels_per_clinic: int = 4, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    channels = channel_table(clinics * channels_per_clinic, seed)
+    channels.insert(0, "clinic_id", np.repeat(np.arange(clinics), channels_per_clinic))
+    totals = channels.groupby("clinic_id")[["leads", "citas", "pacientes"]].sum()
+    table = pd.DataFrame(
+        {
+            "clinic_id": totals.index,
+            "Leads totales": totals["leads"].to_numpy(),
+            "Leads calificados": (totals["leads"] * 0.75).astype(int).to_numpy(),
+            "Citas agendadas": totals["citas"].to_numpy(),
+            "Citas asistidas": (totals["citas"] * 0.8).astype(int).to_numpy(),
+            "Pacientes cerrados": totals["pacientes"].to_numpy(),
+        }
+    )
+    table["Citas no asistidas"] = table["Citas agendadas"] - table["Citas asistidas"]
+    table["ticket"] = 300.0
+    table["recovery"] = 50.0
+    return table[["clinic_id", *SUMMARY_KEYS, "ticket", "recovery"]], channels
+
+
+class HistoryRows:
+    # Sustituye a HistoryStore en PeerIndex.sync y Portfolio.sync: solo necesitan rows_since.
+    def __init__(self, rows: pd.DataFrame) -> None:
+        self.rows = rows
+
+    def rows_since(self, last_id: int) -> pd.DataFrame:
+        return self.rows[self.rows["id"] > last_id]
+
+
+def history_rows(clinics: int, start_id: int = 1, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    agendadas = rng.integers(1, 500, clinics)
+    asistidas = rng.integers(0, agendadas + 1)
+    inversion = rng.uniform(1_000, 50_000, clinics)
+    numbers = rng.integers(0, 100_000, clinics)
+    return pd.DataFrame(
+        {
+            "id": np.arange(start_id, start_id + clinics),
+            "company_key": [f"clinica {i}" for i in numbers],
+            "company": [f"Clínica {i}" for i in numbers],
+            "period": "2026-01",
+            "clinic_type": rng.choice(CLINIC_TYPES, clinics),
+            "roas": rng.lognormal(1.2, 0.5, clinics),
+            "cpl": rng.uniform(5, 50, clinics),
+            "cpa": rng.uniform(20, 300, clinics),
+            "leads_totales": agendadas * 2,
+            "citas_agendadas": agendadas,
+            "citas_asistidas": asistidas,
+            "citas_no_asistidas": agendadas - asistidas,
+            "pacientes_cerrados": rng.integers(0, asistidas + 1),
+            "total_inversion": inversion,
+            "facturacion_actual": inversion * rng.lognormal(1.2, 0.5, clinics),
+            "dinero_perdido": (agendadas - asistidas) * 300.0,
+        }
+    )
+
+
+def peer_index(rows: pd.DataFrame) -> PeerIndex:
+    index = PeerIndex()
+    index.sync(HistoryRows(rows), force=True)
+    return index
+
+
+def daily_rows(clinics: int, day: int, channels_per_clinic: int = 4, seed: int = 0) -> pd.DataFrame:
+    # Un día de eventos agregados por clínica y canal, como lo entrega ingest_events_by_day.
+    rng = np.random.default_rng(seed + day)
+    rows = clinics * channels_per_clinic
+    leads = rng.integers(0, 20, rows)
+    citas = rng.binomial(leads, 0.6)
+    asistidas = rng.binomial(citas, 0.7)
+    return pd.DataFrame(
+        {
+            "clinica": np.repeat([f"clinica-{i}" for i in range(clinics)], channels_per_clinic),
+            "canal": np.tile([f"canal-{j}" for j in range(channels_per_clinic)], clinics),
+            "fecha": np.datetime64("2025-01-01") + day,
+            "leads": leads,
+            "citas": citas,
+            "asistidas": asistidas,
+            "no_shows": citas - asistidas,
+            "pacientes": rng.binomial(asistidas, 0.5),
+            "inversion": rng.uniform(0, 100, rows),
+        }
+    )
+
+
+def lead_events(rows: int, seed: int = 0) -> pd.DataFrame:
+    # Eventos con las cuatro fechas del embudo; parte de los leads no llega a cada etapa.
+    rng = np.random.default_rng(seed)
+    lead = np.datetime64("2025-01-01T00:00") + rng.integers(0, 365 * 24 * 60, rows).astype("timedelta64[m]")
+    cita = lead + rng.lognormal(7, 1, rows).astype("timedelta64[m]")
+    asistencia = cita + rng.lognormal(8, 0.8, rows).astype("timedelta64[m]")
+    cierre = asistencia + rng.lognormal(6, 1.5, rows).astype("timedelta64[m]")
+    return pd.DataFrame(
+        {
+            "canal": rng.choice(["Instagram Ads", "Google Ads", "Facebook Ads", "Web / Orgánico"], rows),
+            "fecha": lead,
+            "fecha_cita": np.where(rng.random(rows) < 0.6, cita, np.datetime64("NaT")),
+            "fecha_asistencia": np.where(rng.random(rows) < 0.45, asistencia, np.datetime64("NaT")),
+            "fecha_cierre": np.where(rng.random(rows) < 0.2, cierre, np.datetime64("NaT")),
+        }
+    )
+
+
+def data_files(directory: Path, rows: int, seed: int = 0) -> tuple[Path, Path]:
+    # Versiones grandes de data/canales.csv y data/cuellos.csv, con los mismos esquemas.
+    rng = np.random.default_rng(seed)
+    channels = channel_table(rows, seed).drop(columns="inversion")
+    channels["Canal"] = rng.choice(["Instagram Ads", "Google Ads", "Facebook Ads", "Web / Orgánico"], rows)
+    bottlenecks = pd.DataFrame(
+        {
+            "Etapa": rng.choice(["Lead → Cita", "Cita → Asistencia", "Asistencia → Cierre"], rows),
+            "Conversión": [f"{v}%" for v in rng.integers(0, 101, rows)],
+        }
+    )
+    channels.to_csv(directory / "canales.csv", index=False)
+    bottlenecks.to_csv(directory / "cuellos.csv", index=False)
+    return directory / "canales.csv", directory / "cuellos.csv"
+
+
+def run() -> dict[str, dict]:
+    results = {}
+    tables = {"4 canales": DEFAULT_CHANNELS, "10k canales": channel_table(10_000), "1M canales": channel_table(1_000_000)}
+    summary = build_default_summary(DEFAULT_CHANNELS)
+
+    results["compute_rates"] = measure(lambda: compute_rates(summary))
+    results["compute_pipeline"] = measure(lambda: compute_pipeline(summary))
+    for label, table in tables.items():
+        table_summary = build_default_summary(table)
+        results[f"build_default_summary [{label}]"] = measure(lambda t=table: build_default_summary(t))
+        results[f"validate_consistency [{label}]"] = measure(lambda t=table, s=table_summary: validate_consistency(t, s))
+        results[f"add_channel_conversions [{label}]"] = measure(lambda t=table: add_channel_conversions(t))
+        results[f"compute_kpis [{label}]"] = measure(lambda t=table, s=table_summary: compute_kpis(t, s, 300.0, 50.0))
+
+    base = scenario_base(summary, 300.0, 50.0, float(DEFAULT_CHANNELS["inversion"].sum()))
+    grids = {"ticket": np.linspace(150, 450, MAX_GRID_STEPS), "recovery": np.linspace(0, 100, MAX_GRID_STEPS)}
+    results[f"sweep [{MAX_GRID_STEPS}x{MAX_GRID_STEPS}]"] = measure(lambda: sweep(base, grids))
+    results["sensitivity"] = measure(lambda: sensitivity(base, "roas"))
+    campaigns = channel_table(500)
+    curves = response_curves(campaigns, 300.0, np.random.default_rng(0).uniform(0.3, 0.9, len(campaigns)))
+    budgets = np.linspace(0, 2 * campaigns["inversion"].sum(), 1_000)
+    results["optimize [500 canales x 1,000 presupuestos]"] = measure(lambda: optimize(curves, budgets), repeat=5)
+    params = fit_projection(summary, 300.0, 50.0)
+    results["simulate_recoverable [2 x 200k]"] = measure(lambda: simulate_recoverable(params, seed=0), repeat=5)
+
+    for clinics in (1_000, 100_000):
+        table, channels = portfolio(clinics)
+        results[f"score_clinics [{clinics:,} clínicas]"] = measure(lambda t=table, c=channels: score_clinics(t, c))
+        results[f"validate_batch [{clinics:,} clínicas]"] = measure(lambda t=table, c=channels: validate_batch(t, c))
+        scores = score_clinics(table, channels)
+        results[f"reglas classify [{clinics:,} clínicas]"] = measure(lambda s=scores: load_rules().classify(s))
+
+    with tempfile.TemporaryDirectory() as directory:
+        channels_csv, bottlenecks_csv = data_files(Path(directory), 1_000_000)
+        results["read_channels [1M filas]"] = measure(lambda: read_channels(channels_csv), repeat=5)
+        results["read_bottlenecks [1M filas]"] = measure(lambda: read_bottlenecks(bottlenecks_csv), repeat=5)
+        results["load_channels en caché [1M filas]"] = measure(lambda: load_channels(channels_csv))
+
+    events = lead_events(1_000_000)
+    events_channels = channel_column(events)
+    results["LatencyProfile add [1M eventos]"] = measure(lambda: LatencyProfile().add(events_channels, events), repeat=5)
+    day = LatencyProfile()
+    day.add(events_channels, events)
+    days = [day] * 365
+    results["LatencyProfile merge [365 perfiles diarios]"] = measure(
+        lambda: functools.reduce(LatencyProfile.merge, days, LatencyProfile()), repeat=5
+    )
+    results["LatencyProfile quantiles + histogram"] = measure(lambda: (day.quantiles(), day.histogram()))
+
+    rollup = Rollup()
+    for day in range(365):
+        rollup.append(daily_rows(5_000, day))
+    next_days = iter(range(365, 10_000))
+    next_day = daily_rows(5_000, 365)
+    results["Rollup append [1 día, 5,000 clínicas x 4 canales]"] = measure(
+        lambda: rollup.append(next_day.assign(fecha=np.datetime64("2025-01-01") + next(next_days))), repeat=5
+    )
+    results["Rollup report [30/90/365 días]"] = measure(lambda: rollup.report("clinica-0", 300.0, 50.0))
+
+    rows = history_rows(100_000)
+    index = peer_index(rows)
+    results["PeerIndex build [100,000 envíos]"] = measure(lambda: peer_index(rows), repeat=5)
+    results["PeerIndex percentile"] = measure(lambda: index.percentile("roas", 3.0, "Dental"))
+    results["PeerIndex compare"] = measure(
+        lambda: index.compare(dict.fromkeys(("roas", "cpl", "cpa", "show_rate", "no_show_rate", "tasa_cierre"), 10.0))
+    )
+    def portfolio_view():
+        portfolio = Portfolio()
+        portfolio.sync(HistoryRows(rows), force=True)
+        return portfolio.view("2026-01")
+
+    view = portfolio_view()
+    view.order("roas")
+    positions = view.select("clinica 1", "Dental", "roas", True)
+    results["Portfolio sync + vista [100,000 envíos]"] = measure(portfolio_view, repeat=5)
+    results["Portfolio select [orden en caché]"] = measure(lambda: view.select(sort="roas"))
+    results["Portfolio select [búsqueda + tipo]"] = measure(lambda: view.select("clinica 1", "Dental", "roas", True))
+    results["Portfolio totals + página"] = measure(lambda: (view.totals(positions), view.frame(positions[:PAGE_SIZE])))
+
+    new_rows = HistoryRows(pd.concat([rows, history_rows(10, start_id=len(rows) + 1, seed=1)]))
+
+    def sync_new_rows() -> None:
+        index.last_id = len(rows)  # vuelve a aplicar los mismos 10 envíos
+        index.sync(new_rows, force=True)
+
+    results["PeerIndex sync [+10 envíos]"] = measure(sync_new_rows)
+    return results
+
+
+def main() -> int:
+    args = parser("Microbenchmarks de kpis.py").parse_args()
+    return report("compute", run(), args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
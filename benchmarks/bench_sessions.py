@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_app import APP_PATH, send, state_footprint
+from benchmarks.common import parser, percentile, report
+from state import ChannelTable
+
+# Prueba de carga con sesiones simultáneas, sin red: cada sesión es un proceso que recorre
+# app.py con AppTest siguiendo un guion de usuario (nombre de empresa, celda de la etapa 1,
+# etapa 2 y Enviar), con pausas aleatorias entre pasos.
+#
+#   python -m benchmarks.bench_sessions [--save | --compare] [--sessions 1 2 4 8 16] [--iterations 2]
+#
+# AppTest no admite varias ejecuciones en hilos del mismo proceso (cambia el Runtime y la
+# configuración globales), por eso cada sesión va en su propio proceso. Un worker de
+# `streamlit run` ejecuta el Python de todas sus sesiones bajo un solo GIL; para aproximarlo,
+# todos los procesos se fijan por defecto a una CPU (--cpus 0 usa todas).
+#
+# Por nivel de concurrencia reporta la latencia de rerun p50/p95/p99, reruns por segundo, el
+# estado de sesión retenido (mediana) y la memoria residente pico del proceso más grande.
+
+
+def edit_company(at, rng: random.Random, session: int):
+    return at.sidebar.text_input[0].input(f"Clínica {session}-{rng.randrange(1000)}").run()
+
+
+def edit_stage1(at, rng: random.Random, session: int):
+    # st.data_editor no es editable desde AppTest: igual que bench_app.edit_stage1_cell.
+    channels = at.session_state.stage1_channels.frame()
+    row = rng.randrange(len(channels))
+    channels.loc[row, rng.choice(["leads", "citas", "pacientes"])] += 1
+    channels.loc[row, "citas"] = min(channels.loc[row, "citas"], channels.loc[row, "leads"])
+    channels.loc[row, "pacientes"] = min(channels.loc[row, "pacientes"], channels.loc[row, "citas"])
+    at.session_state.stage1_channels = ChannelTable.from_frame(channels)
+    return at.run()
+
+
+def edit_stage2(at, rng: random.Random, session: int):
+    leads = at.session_state.stage2_summary["Leads totales"]
+    return at.sidebar.number_input[1].set_value(rng.randint(0, leads)).run()
+
+
+USER_SCRIPT = (
+    ("primera carga", lambda at, rng, session: at.run()),
+    ("nombre de empresa", edit_company),
+    ("celda etapa 1", edit_stage1),
+    ("etapa 2", edit_stage2),
+    ("enviar", lambda at, rng, session: send(at)),
+)
+
+
+def session_worker(session: int, args, barrier, results) -> None:
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(args.seed * 10_000 + session)
+    AppTest.from_file(APP_PATH, default_timeout=120).run()  # calienta imports y cachés del proceso
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    barrier.wait()
+
+    started = time.monotonic()
+    latencies = []
+    for _ in range(args.iterations):
+        for name, step in USER_SCRIPT:
+            if args.think:
+                time.sleep(rng.expovariate(1 / args.think))
+            step_started = time.perf_counter()
+            step(at, rng, session)
+            latencies.append(time.perf_counter() - step_started)
+            if at.exception:
+                results.put({"error": f"{name}: {at.exception[0].message}"})
+                return
+    results.put(
+        {
+            "latencies": latencies,
+            "started": started,
+            "finished": time.monotonic(),
+            "state_kb": state_footprint(at),
+            "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+    )
+
+
+def run_level(sessions: int, args) -> dict:
+    ctx = mp.get_context("fork")
+    barrier = ctx.Barrier(sessions)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=session_worker, args=(i, args, barrier, results)) for i in range(sessions)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    errors = [o["error"] for o in outcomes if "error" in o]
+    if errors:
+        raise RuntimeError(errors[0])
+    latencies = [s for o in outcomes for s in o["latencies"]]
+    elapsed = max(o["finished"] for o in outcomes) - min(o["started"] for o in outcomes)
+    return {
+        "median_s": statistics.median(latencies),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "rps": len(latencies) / elapsed,
+        "state_kb": statistics.median(o["state_kb"] for o in outcomes),
+        "peak_mb": max(o["rss_mb"] for o in outcomes),
+        "reruns": len(latencies),
+    }
+
+
+def main() -> int:
+    p = parser("Prueba de carga de app.py con sesiones simultáneas")
+    p.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    p.add_argument("--iterations", type=int, default=2, help="Repeticiones del guion por sesión.")
+    p.add_argument("--think", type=float, default=0.5, help="Pausa media entre pasos, en segundos.")
+    p.add_argument("--cpus", type=int, default=1, help="CPUs para todas las sesiones (0 = sin restricción).")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    os.environ.setdefault("DASHBOARD_HISTORY_DB", str(Path(tempfile.mkdtemp()) / "historial.sqlite"))
+    if args.cpus:
+        os.sched_setaffinity(0, sorted(os.sched_getaffinity(0))[: args.cpus])
+    # Los procesos se bifurcan con Streamlit ya importado, como las sesiones de un mismo worker.
+    import streamlit.testing.v1  # noqa: F401
+
+    results = {f"{n} sesiones": run_level(n, args) for n in args.sessions}
+    return report("sessions", results, args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.common import parser, percentile, report
+
+# Arranque en frío: cada medición es un proceso de Python nuevo, como un worker recién creado.
+#
+#   python -m benchmarks.bench_startup [--save | --compare] [--runs 5]
+#
+# Además de comparar con la línea base, falla si se supera el objetivo absoluto de
+# STARTUP_TARGETS o si importar los módulos del dashboard carga plotly.express (solo debe
+# cargarse al dibujar el primer gráfico).
+
+ROOT = Path(__file__).resolve().parent.parent
+
+STARTUP_TARGETS = {"importar módulos": 1.5, "primera carga": 3.0}
+CHECK_MESSAGES = {
+    "importar módulos": "plotly.express se importó al arrancar",
+    "primera carga": "la primera ejecución de app.py terminó con error",
+}
+
+IMPORT_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import streamlit, budget, caching, datasets, history, ingest, kpis, latency, montecarlo, peers, portfolio, profiling, render, resources, rollups, rules, scenarios, state, theme
+elapsed = time.perf_counter() - started
+print(json.dumps({"s": elapsed, "ok": "plotly.express" not in sys.modules}))
+"""
+
+FIRST_RUN_SNIPPET = """
+import json, os, tempfile, time
+os.environ.setdefault("DASHBOARD_HISTORY_DB", os.path.join(tempfile.mkdtemp(), "historial.sqlite"))
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60).run()
+elapsed = time.perf_counter() - started
+print(json.dumps({"s": elapsed, "ok": not at.exception}))
+"""
+
+
+def cold_run(snippet: str) -> dict:
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int) -> tuple[dict[str, dict], list[str]]:
+    results, failures = {}, []
+    for name, snippet in (("importar módulos", IMPORT_SNIPPET), ("primera carga", FIRST_RUN_SNIPPET)):
+        samples = [cold_run(snippet) for _ in range(runs)]
+        timings = [s["s"] for s in samples]
+        results[name] = {"median_s": statistics.median(timings), "p95_s": percentile(timings, 95), "runs": runs}
+        if not all(s["ok"] for s in samples):
+            failures.append(f"{name}: {CHECK_MESSAGES[name]}")
+        if results[name]["median_s"] > STARTUP_TARGETS[name]:
+            failures.append(f"{name}: {results[name]['median_s']:.2f} s supera el objetivo de {STARTUP_TARGETS[name]} s")
+    return results, failures
+
+
+def main() -> int:
+    p = parser("Tiempo de arranque en frío de app.py")
+    p.add_argument("--runs", type=int, default=5)
+    args = p.parse_args()
+    results, failures = run(args.runs)
+    status = report("startup", results, args)
+    for failure in failures:
+        print(failure)
+    return 1 if failures else status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
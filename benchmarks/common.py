@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+from importlib import metadata
+from pathlib import Path
+from typing import Callable
+
+BENCH_DIR = Path(__file__).parent
+BASELINE_DIR = BENCH_DIR / "baselines"
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Un caso es más lento que la línea base si supera este factor (el ruido típico ronda el 10%).
+DEFAULT_THRESHOLD = 1.25
+
+
+def measure(fn: Callable[[], object], repeat: int = 7, min_time: float = 0.05) -> dict:
+    fn()
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - started) / number)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "calls": number * repeat}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def environment() -> dict:
+    packages = {}
+    for name in ("numpy", "pandas", "plotly", "streamlit"):
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "packages": packages,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def parser(description: str) -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--save", action="store_true", help="Guarda los resultados como nueva línea base.")
+    p.add_argument("--compare", action="store_true", help="Compara con la línea base y falla si hay regresiones.")
+    p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Factor de regresión tolerado.")
+    return p
+
+
+def report(name: str, results: dict[str, dict], args: argparse.Namespace, metric: str = "median_s") -> int:
+    payload = {"benchmark": name, "metric": metric, "environment": environment(), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    (RESULTS_DIR / f"{name}.json").write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    baseline_path = BASELINE_DIR / f"{name}.json"
+    baseline = {}
+    if args.compare and baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+
+    regressions = []
+    width = max(len(case) for case in results)
+    for case, values in results.items():
+        line = f"{case:<{width}}  {values[metric] * 1000:>11.4f} ms"
+        if "p99_s" in values:
+            line += f"  p95 {values['p95_s'] * 1000:>9.2f} ms  p99 {values['p99_s'] * 1000:>9.2f} ms"
+        if "peak_mb" in values:
+            line += f"  {values['peak_mb']:>8.2f} MB"
+        if "rps" in values:
+            line += f"  {values['rps']:>9,.1f} req/s"
+        if "state_kb" in values:
+            line += f"  estado {values['state_kb']:>6.1f} KB"
+        if case in baseline:
+            ratio = values[metric] / baseline[case][metric]
+            line += f"  x{ratio:.2f}"
+            if ratio > args.threshold:
+                regressions.append(case)
+                line += "  REGRESIÓN"
+        print(line)
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        baseline_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Línea base guardada en {baseline_path}")
+    if args.compare and not baseline:
+        print(f"No hay línea base en {baseline_path}")
+    if regressions:
+        print(f"{len(regressions)} casos más lentos que la línea base (umbral x{args.threshold}).")
+        return 1
+    return 0
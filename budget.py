@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Reparto óptimo de la inversión entre canales. Cada canal con gasto sigue una curva de
+# rendimientos decrecientes que pasa por su punto observado:
+#
+#   pacientes_i(x) = pacientes_i · (x / inversion_i) ** β_i,   0 < β_i < 1
+#
+# A gasto actual, pacientes por dólar = tasa de cierre / CPL del canal. La facturación
+# ticket · Σ pacientes_i(x_i) se maximiza con Σ x_i = presupuesto: en el óptimo todos los canales
+# tienen el mismo retorno marginal λ, y x_i(λ) = (a_i β_i / λ) ** (1 / (1 - β_i)). λ se busca por
+# bisección en escala logarítmica, a la vez para todos los presupuestos (presupuestos × canales).
+# Los canales sin inversión (p. ej. orgánico) aportan su facturación fija y no reciben presupuesto.
+
+DEFAULT_ELASTICITY = 0.7
+BUDGET_LEVELS = 200
+BISECTION_STEPS = 40
+
+
+def response_curves(channels, ticket: float, elasticity: float | np.ndarray = DEFAULT_ELASTICITY) -> dict:
+    spend = np.asarray(channels["inversion"], dtype=np.float64)
+    patients = np.asarray(channels["pacientes"], dtype=np.float64)
+    beta = np.broadcast_to(np.asarray(elasticity, dtype=np.float64), spend.shape)
+    if ((beta <= 0) | (beta >= 1)).any():
+        raise ValueError("La elasticidad debe estar entre 0 y 1 (sin incluirlos).")
+    active = spend > 0
+    revenue = patients * float(ticket)
+    # ingreso(x) = a · x ** β, con a tal que ingreso(inversion) = ingreso observado
+    scale = np.zeros_like(spend)
+    scale[active] = revenue[active] / spend[active] ** beta[active]
+    return {
+        "active": active,
+        "spend": spend[active],
+        "scale": scale[active],
+        "elasticity": beta[active].copy(),
+        "fixed": float(revenue[~active].sum()),
+    }
+
+
+def curve_revenue(curves: dict, allocation: np.ndarray) -> np.ndarray:
+    return curves["fixed"] + (curves["scale"] * allocation ** curves["elasticity"]).sum(axis=-1)
+
+
+def marginal_return(curves: dict, allocation: np.ndarray) -> np.ndarray:
+    beta = curves["elasticity"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(curves["scale"] > 0, curves["scale"] * beta * allocation ** (beta - 1), 0.0)
+
+
+def optimize(curves: dict, budgets: np.ndarray, steps: int = BISECTION_STEPS) -> np.ndarray:
+    budgets = np.asarray(budgets, dtype=np.float64).reshape(-1, 1)
+    beta = curves["elasticity"]
+    allocation = np.zeros((len(budgets), len(beta)))
+    useful = curves["scale"] > 0
+    if not useful.any():
+        return allocation
+
+    log_gain = np.log(curves["scale"][useful] * beta[useful])
+    exponent = 1 / (1 - beta[useful])
+    positive = np.maximum(budgets, 1e-12)
+    # En el óptimo ningún canal recibe más que el presupuesto y alguno recibe al menos
+    # presupuesto / n: λ queda entre el mayor retorno marginal en cada uno de esos gastos.
+    low = (log_gain - (1 - beta[useful]) * np.log(positive)).max(axis=1, keepdims=True)
+    high = (log_gain - (1 - beta[useful]) * np.log(positive / useful.sum())).max(axis=1, keepdims=True)
+    for _ in range(steps):
+        middle = (low + high) / 2
+        spent = np.exp((log_gain - middle) * exponent).sum(axis=1, keepdims=True)
+        over = spent > positive
+        low = np.where(over, middle, low)
+        high = np.where(over, high, middle)
+
+    shares = np.exp((log_gain - (low + high) / 2) * exponent)
+    allocation[:, useful] = shares / shares.sum(axis=1, keepdims=True) * budgets
+    return allocation
+
+
+def proportional(curves: dict, budgets: np.ndarray) -> np.ndarray:
+    # Reparto actual escalado: cada canal conserva su participación en la inversión.
+    budgets = np.asarray(budgets, dtype=np.float64).reshape(-1, 1)
+    return budgets * curves["spend"] / curves["spend"].sum()
+
+
+def budget_curve(curves: dict, budgets: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Reparto actual": curve_revenue(curves, proportional(curves, budgets)),
+            "Reparto óptimo": curve_revenue(curves, optimize(curves, budgets)),
+        },
+        index=pd.Index(np.asarray(budgets, dtype=np.float64), name="Presupuesto ($)"),
+    )
+
+
+def allocation_table(names, curves: dict, budget: float) -> pd.DataFrame:
+    optimal = optimize(curves, np.array([budget]))[0]
+    return pd.DataFrame(
+        {
+            "Canal": np.asarray(names, dtype=object)[curves["active"]],
+            "Inversión actual": curves["spend"],
+            "Inversión óptima": optimal,
+            "Cambio": optimal - curves["spend"],
+            "Ingreso por $1 adicional": marginal_return(curves, curves["spend"]),
+            "Facturación proyectada": curves["scale"] * optimal ** curves["elasticity"],
+        }
+    )
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+
+def _feed(h: Any, obj: Any) -> None:
+    if isinstance(obj, pd.DataFrame):
+        h.update(b"df")
+        h.update(repr((list(obj.columns), [str(t) for t in obj.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=False).to_numpy().tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for key in sorted(obj, key=str):
+            _feed(h, key)
+            _feed(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"seq")
+        for item in obj:
+            _feed(h, item)
+    else:
+        h.update(type(obj).__name__.encode())
+        h.update(repr(obj).encode())
+    h.update(b"|")
+
+
+def content_hash(obj: Any) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    _feed(h, obj)
+    return h.hexdigest()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 8) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    # Copiable y serializable (p. ej. para medir el estado de sesión): el candado no se copia.
+    def __getstate__(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if k != "_lock"}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                PROCESS_STATS.record(hit=True)
+                return self._data[key]
+            self.misses += 1
+        PROCESS_STATS.record(hit=False)
+
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._data), "maxsize": self.maxsize}
+
+
+class ByteBudgetCache:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._data: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], sizeof: Callable[[Any], int] = len) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.current_bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+class _ProcessStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+# Totales de todas las sesiones del proceso, para observar el caché bajo carga.
+PROCESS_STATS = _ProcessStats()
+
+
+# Resultado de `loader(path)` por ruta, fecha de modificación y tamaño: un archivo editado se
+# vuelve a leer en la siguiente llamada y uno sin cambios cuesta un stat().
+class FileCache:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._data: dict[tuple[Path, Callable], tuple[tuple[int, int], Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str | Path, loader: Callable[[Path], Any]) -> Any:
+        path = Path(path).resolve()
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._data.get((path, loader))
+            if cached is not None and cached[0] == version:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        value = loader(path)
+        with self._lock:
+            self._data[(path, loader)] = (version, value)
+        return value
+
+
+FILE_CACHE = FileCache()
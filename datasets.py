@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from caching import FILE_CACHE
+from kpis import build_default_summary
+from state import COUNT_COLUMNS, ChannelTable
+
+# Lectura tipada de los CSV de data/ (o de otra carpeta con los mismos esquemas):
+#
+#   canales.csv   Canal, [inversion], leads, citas, pacientes
+#   resumen.csv   metrica, valor          (formato largo; valores como "320" o "56%")
+#   pipeline.csv  Etapa, Cantidad
+#   cuellos.csv   Etapa, Conversión       (porcentajes como "56%")
+#
+# Nombres de canal y de etapa como categorías, conteos en int32 y porcentajes como float en
+# unidades de porcentaje (56.0), igual que compute_rates. Cada archivo se lee una vez por
+# versión (ruta, fecha de modificación y tamaño): los resultados son compartidos y no deben
+# modificarse.
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+SEED_DIR = os.environ.get("DASHBOARD_SEED_DIR", "")
+DEFAULT_TICKET = 300.0
+
+
+def parse_percentages(values: pd.Series) -> np.ndarray:
+    # Cada valor distinto se convierte una sola vez: los archivos grandes repiten pocos valores.
+    values = values.astype("category")
+    categories = values.cat.categories.astype(str).str.strip().str.rstrip("%").str.strip()
+    parsed = pd.to_numeric(categories, errors="coerce").to_numpy(dtype=np.float64)
+    # El código -1 (vacío) toma el NaN agregado al final.
+    return np.append(parsed, np.nan)[values.cat.codes.to_numpy()]
+
+
+def _read(path: Path, required: tuple[str, ...], dtype: dict) -> pd.DataFrame:
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [c for c in required if c not in header]
+    if missing:
+        raise ValueError(f"{path.name}: faltan las columnas {', '.join(missing)}.")
+    columns = [c for c in dtype if c in header]
+    return pd.read_csv(path, usecols=columns, dtype={c: dtype[c] for c in columns})
+
+
+def read_channels(path: Path) -> pd.DataFrame:
+    frame = _read(
+        path,
+        ("Canal", *COUNT_COLUMNS),
+        {"Canal": "category", "inversion": np.float64, **dict.fromkeys(COUNT_COLUMNS, np.int32)},
+    )
+    if "inversion" not in frame:
+        frame["inversion"] = 0.0
+    return frame[["Canal", "inversion", *COUNT_COLUMNS]]
+
+
+def read_summary(path: Path) -> pd.Series:
+    frame = _read(path, ("metrica", "valor"), {"metrica": "category", "valor": "category"})
+    values = pd.Series(parse_percentages(frame["valor"]), index=frame["metrica"].astype(str), name="valor")
+    return values[~values.index.duplicated(keep="last")]
+
+
+def read_pipeline(path: Path) -> pd.DataFrame:
+    return _read(path, ("Etapa", "Cantidad"), {"Etapa": "category", "Cantidad": np.int32})
+
+
+def read_bottlenecks(path: Path) -> pd.DataFrame:
+    frame = _read(path, ("Etapa", "Conversión"), {"Etapa": "category", "Conversión": "category"})
+    frame["Conversión"] = parse_percentages(frame["Conversión"])
+    return frame
+
+
+def load_channels(path: str | Path = DATA_DIR / "canales.csv") -> pd.DataFrame:
+    return FILE_CACHE.get(path, read_channels)
+
+
+def load_summary(path: str | Path = DATA_DIR / "resumen.csv") -> pd.Series:
+    return FILE_CACHE.get(path, read_summary)
+
+
+def load_pipeline(path: str | Path = DATA_DIR / "pipeline.csv") -> pd.DataFrame:
+    return FILE_CACHE.get(path, read_pipeline)
+
+
+def load_bottlenecks(path: str | Path = DATA_DIR / "cuellos.csv") -> pd.DataFrame:
+    return FILE_CACHE.get(path, read_bottlenecks)
+
+
+# Valores iniciales del dashboard desde una carpeta: etapa 1 desde canales.csv y, si existe
+# resumen.csv, leads calificados, citas asistidas y ticket promedio. Los totales automáticos
+# de la etapa 2 siempre salen de la etapa 1, como en el formulario.
+def load_seed(directory: str | Path = DATA_DIR) -> dict:
+    directory = Path(directory)
+    channels = ChannelTable.from_frame(load_channels(directory / "canales.csv"))
+    summary = build_default_summary(channels)
+    ticket = DEFAULT_TICKET
+    if (directory / "resumen.csv").exists():
+        values = load_summary(directory / "resumen.csv")
+        for key in ("Leads calificados", "Citas asistidas"):
+            if key in values and np.isfinite(values[key]):
+                summary[key] = int(values[key])
+        summary["Citas no asistidas"] = max(summary["Citas agendadas"] - summary["Citas asistidas"], 0)
+        value = values.get("Ticket promedio ($)", np.nan)
+        if np.isfinite(value) and value > 0:
+            ticket = float(value)
+    return {"channels": channels, "summary": summary, "ticket": ticket}
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from kpis import SUMMARY_KEYS, compute_kpis
+from state import Diagnosis
+
+log = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get("DASHBOARD_HISTORY_DB", str(Path(__file__).parent / "data" / "historial.sqlite"))
+
+SUMMARY_COLUMNS = {
+    "Leads totales": "leads_totales",
+    "Leads calificados": "leads_calificados",
+    "Citas agendadas": "citas_agendadas",
+    "Citas asistidas": "citas_asistidas",
+    "Citas no asistidas": "citas_no_asistidas",
+    "Pacientes cerrados": "pacientes_cerrados",
+}
+
+# Espera máxima de una lectura por los envíos encolados antes de leer sin ellos.
+FLUSH_TIMEOUT = 10.0
+
+KPI_COLUMNS = ("total_inversion", "cpl", "cpa", "facturacion_actual", "roas", "potencial_recuperable", "dinero_perdido")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS diagnosticos (
+    id INTEGER PRIMARY KEY,
+    company_key TEXT NOT NULL,
+    company TEXT NOT NULL,
+    period TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    ticket REAL NOT NULL,
+    recovery REAL NOT NULL,
+    {", ".join(f"{c} INTEGER NOT NULL" for c in SUMMARY_COLUMNS.values())},
+    {", ".join(f"{c} REAL NOT NULL" for c in KPI_COLUMNS)},
+    channels TEXT NOT NULL,
+    clinic_type TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_diagnosticos_company_period ON diagnosticos (company_key, period, id);
+CREATE INDEX IF NOT EXISTS idx_diagnosticos_period ON diagnosticos (period, company_key, id);
+"""
+
+ROW_COLUMNS = (
+    "company_key",
+    "company",
+    "period",
+    "submitted_at",
+    "ticket",
+    "recovery",
+    *SUMMARY_COLUMNS.values(),
+    *KPI_COLUMNS,
+    "channels",
+    "clinic_type",
+)
+
+# Último envío por empresa y periodo: varios envíos del mismo mes se resuelven por el más reciente.
+LATEST = "id IN (SELECT MAX(id) FROM diagnosticos WHERE {where} GROUP BY company_key, period)"
+
+
+def company_key(company: str) -> str:
+    return " ".join(company.lower().split())
+
+
+def current_period() -> str:
+    return datetime.now().strftime("%Y-%m")
+
+
+def recent_periods(count: int = 24) -> list[str]:
+    now = datetime.now()
+    index = now.year * 12 + now.month - 1
+    return [f"{(index - i) // 12:04d}-{(index - i) % 12 + 1:02d}" for i in range(count)]
+
+
+def snapshot_row(applied: Diagnosis) -> tuple:
+    summary = applied.summary
+    kpis = compute_kpis(applied.channels, summary, applied.ticket, applied.recovery)
+    company = applied.company.strip()
+    return (
+        company_key(company),
+        company,
+        applied.period or current_period(),
+        datetime.now().isoformat(timespec="seconds"),
+        applied.ticket,
+        applied.recovery,
+        *(int(summary[k]) for k in SUMMARY_KEYS),
+        *(float(kpis[k]) for k in KPI_COLUMNS),
+        applied.channels.frame().to_json(orient="records", force_ascii=False),
+        applied.clinic_type,
+    )
+
+
+class HistoryStore:
+    # Las escrituras se encolan y un hilo las agrupa en transacciones; las lecturas esperan
+    # a que la cola se vacíe para ver siempre los envíos propios.
+    def __init__(self, path: str = DEFAULT_DB_PATH, batch_size: int = 256, flush_interval: float = 0.05) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.failed = 0
+        self._local = threading.local()
+        self._queue: queue.Queue[tuple | None] = queue.Queue()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Bases creadas antes de existir el tipo de clínica.
+            if "clinic_type" not in {row[1] for row in conn.execute("PRAGMA table_info(diagnosticos)")}:
+                conn.execute("ALTER TABLE diagnosticos ADD COLUMN clinic_type TEXT NOT NULL DEFAULT ''")
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        placeholders = ", ".join("?" for _ in ROW_COLUMNS)
+        insert = f"INSERT INTO diagnosticos ({', '.join(ROW_COLUMNS)}) VALUES ({placeholders})"
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    self._insert(conn, insert, rows)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                conn.close()
+                return
+
+    # Si el lote falla, se reintenta envío por envío: solo se descartan (y se registran) los
+    # que vuelven a fallar, y el hilo sigue atendiendo la cola.
+    def _insert(self, conn: sqlite3.Connection, insert: str, rows: list[tuple]) -> None:
+        try:
+            with conn:
+                conn.executemany(insert, rows)
+            return
+        except Exception:
+            if len(rows) == 1:
+                self.failed += 1
+                log.exception("No se pudo guardar un envío en %s", self.path)
+                return
+        for row in rows:
+            self._insert(conn, insert, [row])
+
+    def record(self, applied: Diagnosis) -> None:
+        self._queue.put(snapshot_row(applied))
+
+    # Espera a que se escriba lo encolado. Devuelve False si se agota `timeout` o el hilo de
+    # escritura ya no está vivo, en lugar de bloquear el rerun para siempre.
+    def flush(self, timeout: float = FLUSH_TIMEOUT) -> bool:
+        deadline = time.monotonic() + timeout
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._writer.is_alive():
+                    log.warning("Historial sin escribir: %d envíos pendientes", self._queue.unfinished_tasks)
+                    return False
+                done.wait(min(remaining, 0.1))
+        return True
+
+    def close(self) -> None:
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def _query(self, sql: str, params: tuple) -> pd.DataFrame:
+        self.flush()
+        return pd.read_sql_query(sql, self._reader(), params=params)
+
+    def company_history(self, company: str, limit: int = 24) -> pd.DataFrame:
+        sql = (
+            f"SELECT * FROM diagnosticos WHERE {LATEST.format(where='company_key = ?')} "
+            "ORDER BY period DESC LIMIT ?"
+        )
+        return self._query(sql, (company_key(company), limit)).iloc[::-1].reset_index(drop=True)
+
+    def portfolio(self, period: str) -> pd.DataFrame:
+        sql = f"SELECT * FROM diagnosticos WHERE {LATEST.format(where='period = ?')} ORDER BY company_key"
+        return self._query(sql, (period,))
+
+    def diagnosis(self, row_id: int) -> pd.Series | None:
+        rows = self._query("SELECT * FROM diagnosticos WHERE id = ?", (int(row_id),))
+        return None if rows.empty else rows.iloc[0]
+
+    # Envíos posteriores a `last_id`, sin la tabla de canales: sirve para mantener índices
+    # derivados (p. ej. peers.PeerIndex) leyendo solo lo nuevo.
+    def rows_since(self, last_id: int) -> pd.DataFrame:
+        columns = ", ".join(c for c in ("id", *ROW_COLUMNS) if c != "channels")
+        return self._query(f"SELECT {columns} FROM diagnosticos WHERE id > ? ORDER BY id", (last_id,))
+
+    def periods(self) -> list[str]:
+        self.flush()
+        rows = self._reader().execute("SELECT DISTINCT period FROM diagnosticos ORDER BY period DESC").fetchall()
+        return [r[0] for r in rows]
+
+
+def row_to_snapshot(row: pd.Series) -> dict:
+    return {
+        "company": row["company"],
+        "period": row["period"],
+        "channels": pd.DataFrame(json.loads(row["channels"])).astype(
+            {"leads": int, "citas": int, "pacientes": int, "inversion": float}
+        ),
+        "summary": {k: int(row[c]) for k, c in SUMMARY_COLUMNS.items()},
+        "ticket": float(row["ticket"]),
+        "recovery": float(row["recovery"]),
+        "clinic_type": row.get("clinic_type", ""),
+    }
+
+
+def period_index(periods: pd.Series) -> pd.Series:
+    parts = periods.str.split("-", expand=True).astype(int)
+    return parts[0] * 12 + parts[1]
+
+
+def trailing_annual(history: pd.DataFrame, column: str, months: int = 12) -> tuple[float, int]:
+    # Suma real de los últimos 12 meses; con menos meses registrados, promedio mensual x 12.
+    if history.empty:
+        return 0.0, 0
+    index = period_index(history["period"])
+    values = history.loc[index > index.max() - months, column]
+    if len(values) == months:
+        return float(values.sum()), months
+    return float(values.mean() * 12), len(values)
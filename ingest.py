@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import unicodedata
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Iterator
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from latency import LatencyProfile
+
+# Ingesta en streaming de exportaciones del CRM (un registro por lead) hacia las
+# formas de la etapa 1 (tabla por canal) y la etapa 2 (resumen). Con columna de fecha,
+# también se obtienen los conteos diarios por canal para rollups.Rollup, y con fechas de
+# cita, asistencia o cierre, los tiempos entre etapas para latency.LatencyProfile.
+
+CHUNK_SIZE = 200_000
+
+COLUMN_ALIASES = {
+    "canal": "canal",
+    "channel": "canal",
+    "fuente": "canal",
+    "estado": "estado",
+    "status": "estado",
+    "etapa": "estado",
+    "inversion": "inversion",
+    "gasto": "inversion",
+    "costo": "inversion",
+    "fecha": "fecha",
+    "date": "fecha",
+    "fecha_lead": "fecha",
+    "fecha_cita": "fecha_cita",
+    "fecha_asistencia": "fecha_asistencia",
+    "fecha_cierre": "fecha_cierre",
+}
+
+# Nivel alcanzado en el embudo: 0 nuevo, 1 contactado, 2 agendado, 3 asistió, 4 cerrado.
+# El no-show cuenta como cita agendada que no se asistió.
+NO_SHOW = -1
+STATE_LEVELS = {
+    "nuevo": 0,
+    "lead": 0,
+    "contactado": 1,
+    "calificado": 1,
+    "agendado": 2,
+    "cita agendada": 2,
+    "asistio": 3,
+    "asistida": 3,
+    "cerrado": 4,
+    "paciente": 4,
+    "venta": 4,
+    "no show": NO_SHOW,
+    "no asistio": NO_SHOW,
+    "no asistida": NO_SHOW,
+}
+
+
+def normalize_state(value: str) -> str:
+    text = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(text.lower().replace("-", " ").replace("_", " ").split())
+
+
+def detect_format(name: str) -> str:
+    suffixes = [s.lower() for s in Path(name).suffixes if s.lower() != ".gz"]
+    if suffixes and suffixes[-1] in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    return "csv"
+
+
+def iter_event_chunks(
+    source: str | Path | IO, fmt: str | None = None, chunksize: int = CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    name = getattr(source, "name", source)
+    fmt = fmt or detect_format(str(name))
+    compression = "gzip" if str(name).lower().endswith(".gz") else "infer"
+    if fmt == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunksize, dtype=False, compression=compression)
+    else:
+        reader = pd.read_csv(
+            source,
+            chunksize=chunksize,
+            usecols=lambda c: c.strip().lower() in COLUMN_ALIASES,
+            compression=compression,
+        )
+    with reader:
+        for chunk in reader:
+            yield chunk.rename(columns=lambda c: COLUMN_ALIASES.get(c.strip().lower(), c))
+
+
+def channel_column(chunk: pd.DataFrame) -> pd.Series:
+    return chunk["canal"].fillna("Sin canal").astype(str).str.strip().astype("category")
+
+
+# Cada valor se interpreta por separado como ISO 8601, así una exportación que mezcla
+# "2026-01-05" y "2026-01-05 10:00" no pierde filas. Devuelve las fechas (NaT si no se
+# pudo leer) y cuántos valores no vacíos no se pudieron interpretar.
+def parse_dates(values: pd.Series) -> tuple[pd.Series, int]:
+    if pd.api.types.is_datetime64_dtype(values):
+        return values, 0
+    parsed = pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601").dt.tz_localize(None)
+    failed = values[parsed.isna() & values.notna()]
+    return parsed, int((failed.astype(str).str.strip() != "").sum())
+
+
+# Suma el chunk en `totals` y, con `daily`, devuelve sus conteos por canal y día (None si el
+# archivo no trae fecha).
+def fold_chunk(
+    chunk: pd.DataFrame,
+    totals: dict[str, np.ndarray],
+    daily: bool = False,
+    latency: LatencyProfile | None = None,
+    rejected: dict[str, int] | None = None,
+) -> pd.DataFrame | None:
+    if "canal" not in chunk or "estado" not in chunk:
+        raise ValueError("El archivo de eventos debe incluir las columnas 'canal' y 'estado'.")
+
+    estados = chunk["estado"].fillna("nuevo").astype("category")
+    categories = [normalize_state(c) for c in estados.cat.categories]
+    unknown = sorted({c for c in categories if c not in STATE_LEVELS})
+    if unknown:
+        raise ValueError(f"Estados no reconocidos en el archivo de eventos: {', '.join(unknown)}.")
+    level = np.array([STATE_LEVELS[c] for c in categories], dtype=np.int8)[estados.cat.codes.to_numpy()]
+
+    no_show = level == NO_SHOW
+    inversion = (
+        pd.to_numeric(chunk["inversion"], errors="coerce").fillna(0.0).to_numpy()
+        if "inversion" in chunk
+        else np.zeros(len(level))
+    )
+    # leads, calificados, citas, asistidas, pacientes, inversión
+    counters = [np.ones(len(level)), (level >= 1) | no_show, (level >= 2) | no_show, level >= 3, level == 4, inversion]
+
+    canales = channel_column(chunk)
+    codes = canales.cat.codes.to_numpy()
+    n = len(canales.cat.categories)
+    sums = np.column_stack([np.bincount(codes, weights=c, minlength=n) for c in counters])
+    for canal, row in zip(canales.cat.categories, sums):
+        if canal in totals:
+            totals[canal] += row
+        else:
+            totals[canal] = row
+
+    if latency is not None:
+        latency.add(canales, chunk)
+    if not daily or "fecha" not in chunk:
+        return None
+    # Cada lead cuenta en el día de su fecha; las filas sin fecha válida solo suman al total.
+    fechas, invalid = parse_dates(chunk["fecha"])
+    fechas = fechas.dt.normalize()
+    if rejected is not None and invalid:
+        rejected["fecha"] = rejected.get("fecha", 0) + invalid
+    day = pd.DataFrame(
+        {
+            "canal": canales,
+            "fecha": fechas.to_numpy(),
+            "leads": counters[0],
+            "citas": counters[2],
+            "asistidas": counters[3],
+            "no_shows": counters[2] & ~counters[3],
+            "pacientes": counters[4],
+            "inversion": inversion,
+        }
+    )
+    return group_days(day.dropna(subset=["fecha"]))
+
+
+def group_days(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.groupby(["canal", "fecha"], observed=True).sum().reset_index()
+
+
+def ingest_events(
+    source: str | Path | IO, fmt: str | None = None, chunksize: int = CHUNK_SIZE
+) -> tuple[pd.DataFrame, dict[str, int]]:
+    channels_df, summary, _ = ingest_events_by_day(source, fmt=fmt, chunksize=chunksize, daily=False)
+    return channels_df, summary
+
+
+# Como ingest_events, más los conteos por canal y día (None si el archivo no trae fecha). Con
+# `latency` (un latency.LatencyProfile), en la misma lectura se agregan los tiempos entre etapas.
+# Con `rejected`, se suman ahí por columna las fechas que no se pudieron interpretar.
+def ingest_events_by_day(
+    source: str | Path | IO,
+    fmt: str | None = None,
+    chunksize: int = CHUNK_SIZE,
+    daily: bool = True,
+    latency: LatencyProfile | None = None,
+    rejected: dict[str, int] | None = None,
+) -> tuple[pd.DataFrame, dict[str, int], pd.DataFrame | None]:
+    totals: dict[str, np.ndarray] = {}
+    # Los conteos diarios se combinan chunk a chunk: la memoria crece con los pares (canal, día),
+    # no con el largo del archivo.
+    by_day: pd.DataFrame | None = None
+    for chunk in iter_event_chunks(source, fmt=fmt, chunksize=chunksize):
+        day = fold_chunk(chunk, totals, daily, latency, rejected)
+        if day is not None:
+            by_day = day if by_day is None else group_days(pd.concat([by_day, day], ignore_index=True))
+
+    if not totals:
+        raise ValueError("El archivo de eventos no contiene registros.")
+
+    matrix = np.vstack(list(totals.values()))
+    counts = matrix[:, :5].round().astype(np.int64)
+    channels_df = pd.DataFrame(
+        {
+            "Canal": list(totals.keys()),
+            "inversion": matrix[:, 5],
+            "leads": counts[:, 0],
+            "citas": counts[:, 2],
+            "pacientes": counts[:, 4],
+        }
+    )
+
+    leads, calificados, citas, asistidas, pacientes = (int(v) for v in counts.sum(axis=0))
+    summary = {
+        "Leads totales": leads,
+        "Leads calificados": calificados,
+        "Citas agendadas": citas,
+        "Citas asistidas": asistidas,
+        "Citas no asistidas": citas - asistidas,
+        "Pacientes cerrados": pacientes,
+    }
+    return channels_df, summary, by_day
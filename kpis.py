@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHANNELS = pd.DataFrame(
+    {
+        "Canal": ["Meta Ads", "Google Ads", "Orgánico", "Bases de Datos"],
+        "inversion": [1200.0, 1000.0, 300.0, 200.0],
+        "leads": [100, 80, 90, 50],
+        "citas": [60, 50, 45, 25],
+        "pacientes": [35, 30, 20, 10],
+    }
+)
+
+SUMMARY_KEYS = (
+    "Leads totales",
+    "Leads calificados",
+    "Citas agendadas",
+    "Citas asistidas",
+    "Citas no asistidas",
+    "Pacientes cerrados",
+)
+
+RATE_KEYS = ("Lead → Cita", "Asistencia → Cierre", "Show rate", "No-Show rate", "Tasa de cierre real")
+
+KPI_KEYS = (
+    "total_inversion",
+    "total_leads",
+    "total_ventas",
+    "cpl",
+    "cpa",
+    "facturacion_actual",
+    "roas",
+    "no_shows",
+    "potencial_recuperable",
+    "dinero_perdido",
+    "potencial_recuperable_anual",
+    "dinero_perdido_anual",
+)
+
+
+def build_default_summary(channels_df: pd.DataFrame) -> dict[str, int]:
+    return {
+        "Leads totales": int(channels_df["leads"].sum()),
+        "Leads calificados": 240,
+        "Citas agendadas": int(channels_df["citas"].sum()),
+        "Citas asistidas": 140,
+        "Citas no asistidas": 40,
+        "Pacientes cerrados": int(channels_df["pacientes"].sum()),
+    }
+
+
+def format_percentage(numerator: float, denominator: float) -> float:
+    if denominator <= 0:
+        return 0.0
+    return round((numerator / denominator) * 100, 1)
+
+
+def compute_rates(summary: dict[str, int]) -> dict[str, float]:
+    return {
+        "Lead → Cita": format_percentage(summary["Citas agendadas"], summary["Leads totales"]),
+        "Asistencia → Cierre": format_percentage(summary["Pacientes cerrados"], summary["Citas asistidas"]),
+        "Show rate": format_percentage(summary["Citas asistidas"], summary["Citas agendadas"]),
+        "No-Show rate": format_percentage(summary["Citas no asistidas"], summary["Citas agendadas"]),
+        "Tasa de cierre real": format_percentage(summary["Pacientes cerrados"], summary["Leads totales"]),
+    }
+
+
+def compute_pipeline(summary: dict[str, int]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Etapa": ["No Show", "Cerrado", "Asistió", "Agendado", "Contactado", "Leads Totales"],
+            "Cantidad": [
+                summary["Citas no asistidas"],
+                summary["Pacientes cerrados"],
+                summary["Citas asistidas"],
+                summary["Citas agendadas"],
+                summary["Leads calificados"],
+                summary["Leads totales"],
+            ],
+        }
+    )
+
+
+VALIDATION_MESSAGES = {
+    "suma_leads": "La suma de leads por canal debe ser igual a Leads totales.",
+    "suma_citas": "La suma de citas por canal debe ser igual a Citas agendadas.",
+    "suma_pacientes": "La suma de pacientes por canal debe ser igual a Pacientes cerrados.",
+    "no_shows": "Citas no asistidas debe ser igual a Citas agendadas - Citas asistidas.",
+    "calificados_max": "Leads calificados no puede ser mayor que Leads totales.",
+    "asistidas_max": "Citas asistidas no puede ser mayor que Citas agendadas.",
+}
+
+
+def validate_consistency(channels_df: pd.DataFrame, summary: dict[str, int]) -> list[str]:
+    errors = []
+    if int(channels_df["leads"].sum()) != summary["Leads totales"]:
+        errors.append(VALIDATION_MESSAGES["suma_leads"])
+    if int(channels_df["citas"].sum()) != summary["Citas agendadas"]:
+        errors.append(VALIDATION_MESSAGES["suma_citas"])
+    if int(channels_df["pacientes"].sum()) != summary["Pacientes cerrados"]:
+        errors.append(VALIDATION_MESSAGES["suma_pacientes"])
+
+    expected_no_show = summary["Citas agendadas"] - summary["Citas asistidas"]
+    if summary["Citas no asistidas"] != expected_no_show:
+        errors.append(VALIDATION_MESSAGES["no_shows"])
+
+    if summary["Leads calificados"] > summary["Leads totales"]:
+        errors.append(VALIDATION_MESSAGES["calificados_max"])
+    if summary["Citas asistidas"] > summary["Citas agendadas"]:
+        errors.append(VALIDATION_MESSAGES["asistidas_max"])
+
+    return errors
+
+
+def compute_kpis(channels_df: pd.DataFrame, summary: dict[str, int], ticket: float, recovery: float) -> dict[str, float]:
+    ticket_promedio = float(ticket)
+    recovery_pct = float(recovery)
+
+    total_inversion = float(channels_df["inversion"].sum())
+    total_leads = int(summary["Leads totales"])
+    total_ventas = int(summary["Pacientes cerrados"])
+
+    cpl = total_inversion / total_leads if total_leads > 0 else 0.0
+    cpa = total_inversion / total_ventas if total_ventas > 0 else 0.0
+
+    facturacion_actual = total_ventas * ticket_promedio
+    roas = facturacion_actual / total_inversion if total_inversion > 0 else 0.0
+
+    no_shows = int(summary["Citas no asistidas"])
+    potencial_recuperable = int(no_shows * (recovery_pct / 100) * ticket_promedio)
+    dinero_perdido = int(no_shows * ticket_promedio)
+
+    return {
+        "total_inversion": total_inversion,
+        "total_leads": total_leads,
+        "total_ventas": total_ventas,
+        "cpl": cpl,
+        "cpa": cpa,
+        "facturacion_actual": facturacion_actual,
+        "roas": roas,
+        "no_shows": no_shows,
+        "potencial_recuperable": potencial_recuperable,
+        "dinero_perdido": dinero_perdido,
+        "potencial_recuperable_anual": potencial_recuperable * 12,
+        "dinero_perdido_anual": dinero_perdido * 12,
+    }
+
+
+def compute_bottlenecks(rates: dict[str, float]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Etapa": ["Lead → Cita", "Cita → Asistencia", "Asistencia → Cierre", "Cierre real"],
+            "Conversión": [
+                f"{rates['Lead → Cita']:.1f}%",
+                f"{rates['Show rate']:.1f}%",
+                f"{rates['Asistencia → Cierre']:.1f}%",
+                f"{rates['Tasa de cierre real']:.1f}%",
+            ],
+        }
+    )
+
+
+CLOSE_RATE_THRESHOLDS = (35.0, 50.0)
+
+
+def close_rate_class(close_rate: float, thresholds: tuple[float, float] = CLOSE_RATE_THRESHOLDS) -> str:
+    danger, warning = thresholds
+    if close_rate < danger:
+        return "danger"
+    if close_rate < warning:
+        return "warning"
+    return ""
+
+
+# Versión columnar: una fila por clínica (`clinics`) y una fila por clínica×canal (`channels`),
+# ambas enlazadas por `clinic_id`. Replica exactamente los números de las funciones escalares.
+
+
+def _round1(values: np.ndarray) -> np.ndarray:
+    # round(x, 1) de Python redondea el valor binario exacto; np.round falla en los casi-empates.
+    scaled = values * 10.0
+    rounded = np.rint(scaled) / 10.0
+    lower = np.floor(scaled)
+    near_tie = np.abs(scaled - lower - 0.5) < 1e-6
+    if near_tie.any():
+        x = values[near_tie]
+        k = lower[near_tie]
+        odd = 2.0 * k + 1.0
+        tie = odd / 20.0
+        # signo exacto de fl(tie) - odd/20 (TwoSum de tie*16 + tie*4 == tie*20)
+        a = tie * 16.0
+        b = tie * 4.0
+        s = a + b
+        bb = s - a
+        err = (a - (s - bb)) + (b - bb)
+        side = np.sign(x - tie)
+        side = np.where(side == 0, np.sign((s - odd) + err), side)
+        up = np.where(side == 0, k % 2 == 1, side > 0)
+        rounded[near_tie] = np.where(up, k + 1.0, k) / 10.0
+    return rounded
+
+
+def percentage_columns(numerator, denominator) -> np.ndarray:
+    num = np.asarray(numerator, dtype=np.float64)
+    den = np.asarray(denominator, dtype=np.float64)
+    valid = den > 0
+    ratio = np.divide(num, den, out=np.zeros_like(num), where=valid) * 100
+    return np.where(valid, _round1(ratio), 0.0)
+
+
+def add_channel_conversions(channels_df: pd.DataFrame) -> pd.DataFrame:
+    out = channels_df.copy()
+    out["Conv. cita %"] = percentage_columns(out["citas"].to_numpy(), out["leads"].to_numpy())
+    out["Conv. cierre %"] = percentage_columns(out["pacientes"].to_numpy(), out["citas"].to_numpy())
+    return out
+
+
+def compute_rates_batch(clinics: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Lead → Cita": percentage_columns(clinics["Citas agendadas"], clinics["Leads totales"]),
+            "Asistencia → Cierre": percentage_columns(clinics["Pacientes cerrados"], clinics["Citas asistidas"]),
+            "Show rate": percentage_columns(clinics["Citas asistidas"], clinics["Citas agendadas"]),
+            "No-Show rate": percentage_columns(clinics["Citas no asistidas"], clinics["Citas agendadas"]),
+            "Tasa de cierre real": percentage_columns(clinics["Pacientes cerrados"], clinics["Leads totales"]),
+        },
+        index=clinics.index,
+    )
+
+
+def sum_by_clinic(clinic_ids: pd.Index, channels: pd.DataFrame, columns: list[str]) -> np.ndarray:
+    codes = clinic_ids.get_indexer(channels["clinic_id"])
+    known = codes >= 0
+    codes = codes[known]
+    return np.vstack(
+        [
+            np.bincount(codes, weights=channels[c].to_numpy(dtype=np.float64)[known], minlength=len(clinic_ids))
+            for c in columns
+        ]
+    )
+
+
+def compute_kpis_batch(clinics: pd.DataFrame, channels: pd.DataFrame) -> pd.DataFrame:
+    clinic_ids = pd.Index(clinics["clinic_id"])
+    ticket = clinics["ticket"].to_numpy(dtype=np.float64)
+    recovery = clinics["recovery"].to_numpy(dtype=np.float64)
+
+    total_inversion = sum_by_clinic(clinic_ids, channels, ["inversion"])[0]
+    total_leads = clinics["Leads totales"].to_numpy(dtype=np.int64)
+    total_ventas = clinics["Pacientes cerrados"].to_numpy(dtype=np.int64)
+
+    has_leads = total_leads > 0
+    has_ventas = total_ventas > 0
+    has_inversion = total_inversion > 0
+    cpl = np.divide(total_inversion, total_leads, out=np.zeros_like(total_inversion), where=has_leads)
+    cpa = np.divide(total_inversion, total_ventas, out=np.zeros_like(total_inversion), where=has_ventas)
+
+    facturacion_actual = total_ventas * ticket
+    roas = np.divide(facturacion_actual, total_inversion, out=np.zeros_like(total_inversion), where=has_inversion)
+
+    no_shows = clinics["Citas no asistidas"].to_numpy(dtype=np.int64)
+    potencial_recuperable = np.trunc(no_shows * (recovery / 100) * ticket).astype(np.int64)
+    dinero_perdido = np.trunc(no_shows * ticket).astype(np.int64)
+
+    return pd.DataFrame(
+        {
+            "total_inversion": total_inversion,
+            "total_leads": total_leads,
+            "total_ventas": total_ventas,
+            "cpl": cpl,
+            "cpa": cpa,
+            "facturacion_actual": facturacion_actual,
+            "roas": roas,
+            "no_shows": no_shows,
+            "potencial_recuperable": potencial_recuperable,
+            "dinero_perdido": dinero_perdido,
+            "potencial_recuperable_anual": potencial_recuperable * 12,
+            "dinero_perdido_anual": dinero_perdido * 12,
+        },
+        index=clinic_ids,
+    )
+
+
+def score_clinics(clinics: pd.DataFrame, channels: pd.DataFrame) -> pd.DataFrame:
+    kpis = compute_kpis_batch(clinics, channels)
+    rates = compute_rates_batch(clinics)
+    rates.index = kpis.index
+    return pd.concat([kpis, rates], axis=1)
+
+
+def validate_batch(clinics: pd.DataFrame, channels: pd.DataFrame) -> pd.DataFrame:
+    # Mismas reglas que validate_consistency, evaluadas por columnas. Devuelve una fila por
+    # clínica y regla incumplida: `esperado` es el valor (o el máximo) que exige la regla.
+    clinic_ids = pd.Index(clinics["clinic_id"])
+    col = {k: clinics[k].to_numpy(dtype=np.int64) for k in SUMMARY_KEYS}
+    count_columns = ["leads", "citas", "pacientes"]
+    sums = dict(zip(count_columns, sum_by_clinic(clinic_ids, channels, count_columns).astype(np.int64)))
+    expected_no_show = col["Citas agendadas"] - col["Citas asistidas"]
+    # regla, campo, esperado, actual, incumplimiento
+    checks = [
+        ("suma_leads", "Leads totales", sums["leads"], col["Leads totales"], sums["leads"] != col["Leads totales"]),
+        (
+            "suma_citas",
+            "Citas agendadas",
+            sums["citas"],
+            col["Citas agendadas"],
+            sums["citas"] != col["Citas agendadas"],
+        ),
+        (
+            "suma_pacientes",
+            "Pacientes cerrados",
+            sums["pacientes"],
+            col["Pacientes cerrados"],
+            sums["pacientes"] != col["Pacientes cerrados"],
+        ),
+        (
+            "no_shows",
+            "Citas no asistidas",
+            expected_no_show,
+            col["Citas no asistidas"],
+            col["Citas no asistidas"] != expected_no_show,
+        ),
+        (
+            "calificados_max",
+            "Leads calificados",
+            col["Leads totales"],
+            col["Leads calificados"],
+            col["Leads calificados"] > col["Leads totales"],
+        ),
+        (
+            "asistidas_max",
+            "Citas asistidas",
+            col["Citas agendadas"],
+            col["Citas asistidas"],
+            col["Citas asistidas"] > col["Citas agendadas"],
+        ),
+    ]
+
+    positions, rules, expected, actual = [], [], [], []
+    for code, (_, _, esperado, actual_values, failed_mask) in enumerate(checks):
+        failed = np.flatnonzero(failed_mask)
+        positions.append(failed)
+        rules.append(np.full(len(failed), code, dtype=np.int8))
+        expected.append(esperado[failed])
+        actual.append(actual_values[failed])
+
+    position = np.concatenate(positions)
+    rule = np.concatenate(rules)
+    order = np.lexsort((rule, position))
+    rule = rule[order]
+    names = [c[0] for c in checks]
+    return pd.DataFrame(
+        {
+            "clinic_id": clinic_ids[position[order]],
+            "regla": pd.Categorical.from_codes(rule, categories=names),
+            "campo": pd.Categorical.from_codes(rule, categories=[c[1] for c in checks]),
+            "esperado": np.concatenate(expected)[order],
+            "actual": np.concatenate(actual)[order],
+            "mensaje": pd.Categorical.from_codes(rule, categories=[VALIDATION_MESSAGES[n] for n in names]),
+        }
+    )
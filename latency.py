@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import IO
+
+import numpy as np
+import pandas as pd
+
+from ingest import channel_column, iter_event_chunks, parse_dates
+
+# Tiempos entre etapas del embudo por canal (lead → cita, cita → asistencia, asistencia →
+# cierre) con bocetos de cuantiles de buckets logarítmicos, como DDSketch: cada latencia cae en
+# el bucket ceil(log_γ(horas / MIN_HOURS)), con γ = (1 + α) / (1 - α), así que cualquier cuantil
+# se estima con error relativo de a lo sumo α. Cada boceto es un arreglo de BUCKETS conteos:
+# la memoria no depende de la cantidad de eventos y los perfiles de distintos días o clínicas
+# se combinan sumando conteos.
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+# Por debajo de un minuto la latencia cuenta como 0 (p. ej. fechas sin hora del mismo día).
+MIN_HOURS = 1 / 60
+# Bucket 0 para latencia 0; los demás cubren de un minuto a más de mil años.
+BUCKETS = 1024
+BUCKET_HOURS = np.r_[0.0, MIN_HOURS * 2 * GAMMA ** np.arange(BUCKETS - 1) / (GAMMA + 1)]
+
+# etapa: (columna de inicio, columna de fin). "fecha" es la fecha del lead.
+LATENCY_STAGES = {
+    "Lead → Cita": ("fecha", "fecha_cita"),
+    "Cita → Asistencia": ("fecha_cita", "fecha_asistencia"),
+    "Asistencia → Cierre": ("fecha_asistencia", "fecha_cierre"),
+}
+LATENCY_COLUMNS = ("fecha", "fecha_cita", "fecha_asistencia", "fecha_cierre")
+
+HISTOGRAM_BINS = {
+    "< 1 h": 1,
+    "1–6 h": 6,
+    "6–24 h": 24,
+    "1–3 días": 72,
+    "3–7 días": 168,
+    "1–2 semanas": 336,
+    "2–4 semanas": 720,
+    "> 30 días": np.inf,
+}
+
+
+def bucket_index(hours: np.ndarray) -> np.ndarray:
+    scaled = np.log(np.maximum(hours, MIN_HOURS) / MIN_HOURS) / np.log(GAMMA)
+    # Redondeo previo: una latencia exactamente en el borde no salta al bucket siguiente.
+    index = np.ceil(np.round(scaled, 9)).astype(np.int64) + 1
+    return np.where(hours < MIN_HOURS, 0, np.minimum(index, BUCKETS - 1))
+
+
+def timestamps(values: pd.Series) -> tuple[np.ndarray, int]:
+    parsed, invalid = parse_dates(values)
+    return parsed.to_numpy(dtype="datetime64[ns]"), invalid
+
+
+def format_hours(hours: float) -> str:
+    if not np.isfinite(hours):
+        return "—"
+    if hours < 1:
+        return f"{hours * 60:.0f} min"
+    if hours < 48:
+        return f"{hours:.1f} h"
+    return f"{hours / 24:.1f} días"
+
+
+class LatencyProfile:
+    def __init__(self) -> None:
+        self.channels: list[str] = []
+        self.counts = np.zeros((0, len(LATENCY_STAGES), BUCKETS), dtype=np.int64)
+        # Etapas con fecha de fin anterior a la de inicio: se descartan y se cuentan aparte.
+        self.skipped = 0
+        # Fechas no vacías que no se pudieron interpretar, por columna.
+        self.invalid: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return int(self.counts.sum())
+
+    def _rows(self, channels) -> np.ndarray:
+        positions = {name: i for i, name in enumerate(self.channels)}
+        new = [str(c) for c in channels if str(c) not in positions]
+        if new:
+            self.channels.extend(new)
+            grown = np.zeros((len(self.channels), len(LATENCY_STAGES), BUCKETS), dtype=np.int64)
+            grown[: len(self.counts)] = self.counts
+            self.counts = grown
+            positions = {name: i for i, name in enumerate(self.channels)}
+        return np.array([positions[str(c)] for c in channels], dtype=np.int64)
+
+    # `channels`: canal de cada evento como categoría; `frame`: las columnas de LATENCY_COLUMNS
+    # que traiga el archivo. Las fechas vacías o inválidas no cuentan; las inválidas se suman en
+    # `invalid`.
+    def add(self, channels: pd.Series, frame: pd.DataFrame) -> int:
+        stamps = {}
+        for column in LATENCY_COLUMNS:
+            if column in frame:
+                stamps[column], invalid = timestamps(frame[column])
+                if invalid:
+                    self.invalid[column] = self.invalid.get(column, 0) + invalid
+        rows = self._rows(channels.cat.categories)[channels.cat.codes.to_numpy()]
+        flat = []
+        for j, (start, end) in enumerate(LATENCY_STAGES.values()):
+            if start not in stamps or end not in stamps:
+                continue
+            hours = (stamps[end] - stamps[start]) / np.timedelta64(1, "h")
+            negative = hours < 0
+            self.skipped += int(negative.sum())
+            valid = ~np.isnan(hours) & ~negative
+            flat.append((rows[valid] * len(LATENCY_STAGES) + j) * BUCKETS + bucket_index(hours[valid]))
+        if not flat:
+            return 0
+        flat = np.concatenate(flat)
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        return len(flat)
+
+    def merge(self, other: LatencyProfile) -> LatencyProfile:
+        rows = self._rows(other.channels)
+        self.counts[rows] += other.counts
+        self.skipped += other.skipped
+        for column, invalid in other.invalid.items():
+            self.invalid[column] = self.invalid.get(column, 0) + invalid
+        return self
+
+    def _stage_counts(self, channel: str | None) -> np.ndarray:
+        if channel is None:
+            return self.counts.sum(axis=0)
+        if channel not in self.channels:
+            return np.zeros((len(LATENCY_STAGES), BUCKETS), dtype=np.int64)
+        return self.counts[self.channels.index(channel)]
+
+    # Cuantiles en horas por etapa, de un canal o de todos (channel=None).
+    def quantiles(self, qs: tuple[float, ...] = (50, 90), channel: str | None = None) -> pd.DataFrame:
+        counts = self._stage_counts(channel)
+        cumulative = np.cumsum(counts, axis=1)
+        totals = cumulative[:, -1]
+        columns = {"Medidos": totals}
+        for q in qs:
+            ranks = q / 100 * np.maximum(totals - 1, 0)
+            buckets = [np.searchsorted(c, r, side="right") for c, r in zip(cumulative, ranks)]
+            columns[f"P{q:g}"] = np.where(totals > 0, BUCKET_HOURS[np.minimum(buckets, BUCKETS - 1)], np.nan)
+        return pd.DataFrame(columns, index=pd.Index(list(LATENCY_STAGES), name="Etapa"))
+
+    def histogram(self, channel: str | None = None) -> pd.DataFrame:
+        counts = self._stage_counts(channel)
+        bins = np.searchsorted(np.array(list(HISTOGRAM_BINS.values())), BUCKET_HOURS, side="right")
+        bins = np.minimum(bins, len(HISTOGRAM_BINS) - 1)
+        labels = list(HISTOGRAM_BINS)
+        return pd.DataFrame(
+            {
+                stage: np.bincount(bins, weights=row, minlength=len(labels)).astype(np.int64)
+                for stage, row in zip(LATENCY_STAGES, counts)
+            },
+            index=pd.CategoricalIndex(labels, categories=labels, ordered=True, name="Tiempo"),
+        )
+
+
+def latency_table(profile: LatencyProfile, channel: str | None = None) -> pd.DataFrame:
+    table = profile.quantiles((50, 90), channel)
+    return pd.DataFrame(
+        {
+            "Medidos": [f"{n:,}" for n in table["Medidos"]],
+            "P50": [format_hours(h) for h in table["P50"]],
+            "P90": [format_hours(h) for h in table["P90"]],
+        },
+        index=table.index,
+    ).reset_index()
+
+
+# Perfil de un archivo completo del CRM, leído por bloques con memoria acotada.
+def profile_events(source: str | Path | IO, fmt: str | None = None) -> LatencyProfile:
+    profile = LatencyProfile()
+    for chunk in iter_event_chunks(source, fmt=fmt):
+        profile.add(channel_column(chunk), chunk)
+    return profile
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import streamlit as st
+
+from history import row_to_snapshot
+from portfolio import PAGE_SIZE, PORTFOLIO_COLUMNS
+from render import module_card_html
+from resources import get_history_store, get_portfolio
+from theme import THEME_CSS
+
+# Vista de cartera: una fila por clínica con su último diagnóstico del periodo. Filtros, orden,
+# totales y paginación se resuelven en el servidor (portfolio.py); al navegador solo llega la
+# página visible. Elegir una fila abre el dashboard de esa clínica.
+
+st.set_page_config(page_title="Cartera de clínicas", layout="wide")
+st.markdown(THEME_CSS, unsafe_allow_html=True)
+
+SORT_OPTIONS = {c: label for c, label in PORTFOLIO_COLUMNS.items() if c != "clinic_type"}
+
+store = get_history_store()
+portfolio = get_portfolio()
+portfolio.sync(store)
+
+st.title("Cartera de clínicas")
+periods = portfolio.periods()
+if not periods:
+    st.info("Aún no hay diagnósticos guardados. Envía un diagnóstico con nombre de empresa desde el dashboard.")
+    st.page_link("app.py", label="Ir al dashboard")
+    st.stop()
+
+period_col, search_col, type_col, sort_col, desc_col = st.columns([1, 2, 1, 1, 1])
+period = period_col.selectbox("Periodo", periods, key="cartera_period")
+view = portfolio.view(period)
+search = search_col.text_input("Buscar clínica", key="cartera_search", placeholder="Nombre")
+clinic_type = type_col.selectbox(
+    "Tipo de clínica", ["", *view.clinic_types()], format_func=lambda t: t or "Todos", key="cartera_type"
+)
+sort = sort_col.selectbox(
+    "Ordenar por",
+    list(SORT_OPTIONS),
+    index=list(SORT_OPTIONS).index("dinero_perdido"),
+    format_func=SORT_OPTIONS.get,
+    key="cartera_sort",
+)
+descending = desc_col.toggle("Desc.", value=True, key="cartera_desc")
+
+positions = view.select(search, clinic_type, sort, descending)
+totals = view.totals(positions)
+cards = (
+    ("Clínicas", f"{totals['clinicas']:,}", f"de {len(view):,} en {period}"),
+    ("Inversión", f"${totals['inversion']:,.0f}", "Suma de la selección"),
+    ("ROAS", f"{totals['roas']:,.2f}x", "Facturación / Inversión"),
+    ("CPA", f"${totals['cpa']:,.2f}", "Inversión / Ventas"),
+    ("No-Show", f"{totals['no_show_rate']:.1f}%", "No asistidas / Agendadas"),
+    ("Dinero perdido", f"${totals['dinero_perdido']:,.0f}", "Suma de la selección"),
+)
+for column, card in zip(st.columns(len(cards)), cards):
+    column.markdown(module_card_html(*card), unsafe_allow_html=True)
+
+if not len(positions):
+    st.caption("Ninguna clínica coincide con los filtros.")
+    st.stop()
+
+pages = -(-len(positions) // PAGE_SIZE)
+if st.session_state.get("cartera_page", 1) > pages:
+    st.session_state.cartera_page = pages
+page_col, info_col = st.columns([1, 4])
+page = int(page_col.number_input("Página", min_value=1, max_value=pages, step=1, key="cartera_page"))
+start = (page - 1) * PAGE_SIZE
+info_col.caption(
+    f"Filas {start + 1:,}–{min(start + PAGE_SIZE, len(positions)):,} de {len(positions):,}. "
+    "Selecciona una fila para abrir el dashboard de esa clínica."
+)
+
+table = view.frame(positions[start : start + PAGE_SIZE])
+event = st.dataframe(
+    table,
+    hide_index=True,
+    use_container_width=True,
+    on_select="rerun",
+    selection_mode="single-row",
+    key="cartera_table",
+    column_config={
+        "ROAS": st.column_config.NumberColumn(format="%.2fx"),
+        "CPA": st.column_config.NumberColumn(format="$ %.2f"),
+        "No-Show rate": st.column_config.NumberColumn(format="%.1f%%"),
+        "Dinero perdido": st.column_config.NumberColumn(format="$ %.0f"),
+    },
+)
+
+if event.selection.rows:
+    row = store.diagnosis(int(table.index[event.selection.rows[0]]))
+    if row is None:
+        st.warning("Ese diagnóstico ya no está en el historial.")
+    else:
+        st.session_state.pending_snapshot = row_to_snapshot(row)
+        st.switch_page("app.py")
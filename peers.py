@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from kpis import percentage_columns
+
+# Índice de pares: para cada KPI, arreglos ordenados con el último diagnóstico de cada empresa
+# guardada en el historial, en total y por tipo de clínica. Percentiles y cuartiles se
+# resuelven con búsqueda binaria (np.searchsorted) sin recorrer la población en cada rerun.
+# El índice se mantiene al día leyendo solo los envíos nuevos del historial (rows_since).
+#
+# Una métrica con denominador 0 (p. ej. CPL sin leads) queda como NaN y no entra a los arreglos:
+# compute_kpis la reporta como 0, que en CPL o CPA la pondría como la mejor del grupo.
+
+CLINIC_TYPES = ("Dental", "Estética", "Dermatología", "Fertilidad", "Medicina general", "Otra")
+
+# métrica: (etiqueta, más alto es mejor)
+PEER_METRICS = {
+    "roas": ("ROAS", True),
+    "cpl": ("CPL", False),
+    "cpa": ("CPA", False),
+    "show_rate": ("Show rate", True),
+    "no_show_rate": ("No-Show rate", False),
+    "tasa_cierre": ("Tasa de cierre real", True),
+}
+
+ALL_CLINICS = ""
+MIN_PEERS = 20
+SYNC_INTERVAL = 5.0
+# Con más cambios que este umbral en una sincronización conviene reordenar desde cero.
+REBUILD_THRESHOLD = 64
+
+
+def defined(values, denominator) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.asarray(denominator, dtype=np.float64) > 0, values, np.nan)
+
+
+def history_values(rows: pd.DataFrame) -> np.ndarray:
+    return np.column_stack(
+        [
+            defined(rows["roas"], rows["total_inversion"]),
+            defined(rows["cpl"], rows["leads_totales"]),
+            defined(rows["cpa"], rows["pacientes_cerrados"]),
+            defined(percentage_columns(rows["citas_asistidas"], rows["citas_agendadas"]), rows["citas_agendadas"]),
+            defined(percentage_columns(rows["citas_no_asistidas"], rows["citas_agendadas"]), rows["citas_agendadas"]),
+            defined(percentage_columns(rows["pacientes_cerrados"], rows["leads_totales"]), rows["leads_totales"]),
+        ]
+    )
+
+
+def clinic_values(kpis: dict[str, float], rates: dict[str, float], summary: dict[str, int]) -> dict[str, float]:
+    citas = summary["Citas agendadas"]
+    return {
+        "roas": float(defined(kpis["roas"], kpis["total_inversion"])),
+        "cpl": float(defined(kpis["cpl"], kpis["total_leads"])),
+        "cpa": float(defined(kpis["cpa"], kpis["total_ventas"])),
+        "show_rate": float(defined(rates["Show rate"], citas)),
+        "no_show_rate": float(defined(rates["No-Show rate"], citas)),
+        "tasa_cierre": float(defined(rates["Tasa de cierre real"], kpis["total_leads"])),
+    }
+
+
+# Quita y agrega valores a un arreglo ordenado en una sola pasada: O(n + k log k) por segmento.
+def apply_changes(current: np.ndarray, removed: np.ndarray, added: np.ndarray) -> np.ndarray:
+    removed = np.sort(removed[~np.isnan(removed)])
+    added = np.sort(added[~np.isnan(added)])
+    if removed.size:
+        # Con valores repetidos, cada uno quita la siguiente copia.
+        repeat = np.arange(removed.size) - np.searchsorted(removed, removed, side="left")
+        current = np.delete(current, np.searchsorted(current, removed, side="left") + repeat)
+    if added.size:
+        current = np.insert(current, np.searchsorted(current, added), added)
+    return current
+
+
+class PeerIndex:
+    def __init__(self, sync_interval: float = SYNC_INTERVAL) -> None:
+        self.sync_interval = sync_interval
+        self.last_id = 0
+        self.synced_at = float("-inf")
+        # company_key -> (period, id, tipo de clínica, valores en el orden de PEER_METRICS)
+        self._members: dict[str, tuple[str, int, str, tuple[float, ...]]] = {}
+        self._sorted: dict[tuple[str, str], np.ndarray] = {}
+        self._sizes: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def sync(self, store, force: bool = False) -> int:
+        if not force and time.monotonic() - self.synced_at < self.sync_interval:
+            return 0
+        with self._lock:
+            rows = store.rows_since(self.last_id)
+            self.synced_at = time.monotonic()
+            if rows.empty:
+                return 0
+            self._merge(rows)
+            return len(rows)
+
+    def _merge(self, rows: pd.DataFrame) -> None:
+        # company_key -> (entrada antes de la sincronización, entrada nueva)
+        changes: dict[str, tuple] = {}
+        values = history_values(rows)
+        for row_id, key, period, clinic_type, row_values in zip(
+            rows["id"].tolist(), rows["company_key"], rows["period"], rows["clinic_type"], values.tolist()
+        ):
+            old = self._members.get(key)
+            # Cuenta el diagnóstico del periodo más reciente de cada empresa.
+            if old is not None and (old[0], old[1]) > (period, row_id):
+                continue
+            new = (period, row_id, clinic_type, tuple(row_values))
+            self._members[key] = new
+            changes[key] = (changes[key][0] if key in changes else old, new)
+        self.last_id = int(rows["id"].iloc[-1])
+
+        if not self._sorted or len(changes) > REBUILD_THRESHOLD:
+            self._rebuild()
+            return
+        removed, added = defaultdict(list), defaultdict(list)
+        for old, new in changes.values():
+            if old is not None:
+                for segment in {ALL_CLINICS, old[2]}:
+                    removed[segment].append(old[3])
+                    self._sizes[segment] -= 1
+            for segment in {ALL_CLINICS, new[2]}:
+                added[segment].append(new[3])
+                self._sizes[segment] += 1
+        width = len(PEER_METRICS)
+        for segment in removed.keys() | added.keys():
+            old_values = np.array(removed[segment], dtype=np.float64).reshape(-1, width)
+            new_values = np.array(added[segment], dtype=np.float64).reshape(-1, width)
+            for j, metric in enumerate(PEER_METRICS):
+                current = self._sorted.get((segment, metric), np.empty(0))
+                self._sorted[(segment, metric)] = apply_changes(current, old_values[:, j], new_values[:, j])
+
+    def _rebuild(self) -> None:
+        entries = list(self._members.values())
+        types = np.array([e[2] for e in entries], dtype=object)
+        values = np.array([e[3] for e in entries], dtype=np.float64).reshape(len(entries), len(PEER_METRICS))
+        rebuilt = {}
+        sizes: dict[str, int] = defaultdict(int)
+        for segment in (ALL_CLINICS, *sorted(set(types) - {ALL_CLINICS})):
+            subset = values if segment == ALL_CLINICS else values[types == segment]
+            sizes[segment] = len(subset)
+            for j, metric in enumerate(PEER_METRICS):
+                column = subset[:, j]
+                rebuilt[(segment, metric)] = np.sort(column[~np.isnan(column)])
+        self._sorted = rebuilt
+        self._sizes = sizes
+
+    # Clínicas del segmento; cada métrica puede tener menos valores si su denominador fue 0.
+    def size(self, segment: str = ALL_CLINICS) -> int:
+        return self._sizes.get(segment, 0)
+
+    def count(self, metric: str, segment: str = ALL_CLINICS) -> int:
+        values = self._sorted.get((segment, metric))
+        return 0 if values is None else len(values)
+
+    # Segmento del tipo de clínica si tiene suficientes pares; si no, toda la cartera.
+    def segment_for(self, clinic_type: str) -> str:
+        return clinic_type if clinic_type and self.size(clinic_type) >= MIN_PEERS else ALL_CLINICS
+
+    def percentile(self, metric: str, value: float, segment: str = ALL_CLINICS) -> float | None:
+        values = self._sorted.get((segment, metric))
+        if values is None or len(values) < MIN_PEERS or np.isnan(value):
+            return None
+        below = np.searchsorted(values, value, side="left")
+        not_above = np.searchsorted(values, value, side="right")
+        return float((below + not_above) / 2 / len(values) * 100)
+
+    def quantiles(self, metric: str, segment: str = ALL_CLINICS, qs: tuple[float, ...] = (25, 50, 75)) -> tuple:
+        values = self._sorted.get((segment, metric))
+        if values is None or len(values) < MIN_PEERS:
+            return ()
+        positions = np.minimum(np.round(np.asarray(qs) / 100 * (len(values) - 1)).astype(int), len(values) - 1)
+        return tuple(float(v) for v in values[positions])
+
+    def compare(self, values: dict[str, float], segment: str = ALL_CLINICS) -> pd.DataFrame:
+        rows = []
+        for metric, (label, higher_is_better) in PEER_METRICS.items():
+            percentile = self.percentile(metric, values[metric], segment)
+            if percentile is None:
+                continue
+            better_than = percentile if higher_is_better else 100 - percentile
+            q25, q50, q75 = self.quantiles(metric, segment)
+            rows.append(
+                {
+                    "Indicador": label,
+                    "Tu clínica": values[metric],
+                    "Mejor que": f"{better_than:.0f}% de las clínicas",
+                    "P25": q25,
+                    "Mediana": q50,
+                    "P75": q75,
+                }
+            )
+        return pd.DataFrame(rows)
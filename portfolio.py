@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from kpis import percentage_columns
+from peers import SYNC_INTERVAL
+
+# Cartera: el último diagnóstico de cada clínica por periodo, en columnas de numpy compartidas
+# por todas las sesiones. Filtrar, ordenar y totalizar se hace en el servidor y al navegador
+# solo llega la página visible. Igual que peers.PeerIndex, se mantiene al día leyendo solo los
+# envíos nuevos del historial (rows_since); los órdenes por columna se calculan una vez por
+# versión y periodo.
+
+PAGE_SIZE = 50
+
+# columna: etiqueta
+PORTFOLIO_COLUMNS = {
+    "company": "Clínica",
+    "clinic_type": "Tipo",
+    "roas": "ROAS",
+    "cpa": "CPA",
+    "no_show_rate": "No-Show rate",
+    "dinero_perdido": "Dinero perdido",
+}
+
+SOURCE_COLUMNS = (
+    "id",
+    "company_key",
+    "company",
+    "period",
+    "clinic_type",
+    "citas_agendadas",
+    "citas_no_asistidas",
+    "pacientes_cerrados",
+    "total_inversion",
+    "facturacion_actual",
+    "roas",
+    "cpa",
+    "dinero_perdido",
+)
+
+
+class PortfolioView:
+    # Columnas de un periodo. Inmutable: las sesiones la comparten sin copiarla.
+    def __init__(self, rows: pd.DataFrame) -> None:
+        self.ids = rows["id"].to_numpy(dtype=np.int64)
+        self.keys = rows["company_key"].to_numpy(dtype=object)
+        # Búsqueda por nombre sobre cadenas de Arrow (pyarrow viene con Streamlit).
+        self._names = pd.Series(self.keys, dtype="string[pyarrow]")
+        self.columns = {
+            "company": rows["company"].to_numpy(dtype=object),
+            "clinic_type": rows["clinic_type"].fillna("").to_numpy(dtype=object),
+            "roas": rows["roas"].to_numpy(dtype=np.float64),
+            "cpa": rows["cpa"].to_numpy(dtype=np.float64),
+            "no_show_rate": percentage_columns(rows["citas_no_asistidas"], rows["citas_agendadas"]),
+            "dinero_perdido": rows["dinero_perdido"].to_numpy(dtype=np.float64),
+        }
+        self.sums = {
+            c: rows[c].to_numpy(dtype=np.float64)
+            for c in ("total_inversion", "facturacion_actual", "pacientes_cerrados", "citas_agendadas", "citas_no_asistidas")
+        }
+        self._orders: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def clinic_types(self) -> list[str]:
+        return sorted(set(self.columns["clinic_type"]) - {""})
+
+    def order(self, column: str, descending: bool = False) -> np.ndarray:
+        with self._lock:
+            positions = self._orders.get(column)
+            if positions is None:
+                values = self.keys if column == "company" else self.columns[column]
+                positions = self._orders[column] = np.argsort(values, kind="stable")
+        return positions[::-1] if descending else positions
+
+    # Posiciones que pasan los filtros, en el orden pedido.
+    def select(self, search: str = "", clinic_type: str = "", sort: str = "dinero_perdido", descending: bool = True):
+        mask = np.ones(len(self), dtype=bool)
+        search = " ".join(search.lower().split())
+        if search:
+            mask &= self._names.str.contains(search, regex=False).to_numpy(dtype=bool, na_value=False)
+        if clinic_type:
+            mask &= self.columns["clinic_type"] == clinic_type
+        positions = self.order(sort, descending)
+        return positions[mask[positions]]
+
+    # Totales de la selección completa, no solo de la página visible.
+    def totals(self, positions: np.ndarray) -> dict[str, float]:
+        inversion, facturacion, pacientes, agendadas, no_asistidas = (
+            float(values[positions].sum()) for values in self.sums.values()
+        )
+        return {
+            "clinicas": len(positions),
+            "inversion": inversion,
+            "facturacion": facturacion,
+            "roas": facturacion / inversion if inversion else 0.0,
+            "cpa": inversion / pacientes if pacientes else 0.0,
+            "no_show_rate": no_asistidas / agendadas * 100 if agendadas else 0.0,
+            "dinero_perdido": float(self.columns["dinero_perdido"][positions].sum()),
+        }
+
+    def frame(self, positions: np.ndarray) -> pd.DataFrame:
+        page = pd.DataFrame({label: self.columns[c][positions] for c, label in PORTFOLIO_COLUMNS.items()})
+        page.index = pd.Index(self.ids[positions], name="id")
+        return page
+
+
+class Portfolio:
+    def __init__(self, sync_interval: float = SYNC_INTERVAL) -> None:
+        self.sync_interval = sync_interval
+        self.last_id = 0
+        self.synced_at = float("-inf")
+        self.version = 0
+        self._rows = pd.DataFrame(columns=list(SOURCE_COLUMNS))
+        self._views: dict[str, PortfolioView] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def sync(self, store, force: bool = False) -> int:
+        if not force and time.monotonic() - self.synced_at < self.sync_interval:
+            return 0
+        with self._lock:
+            rows = store.rows_since(self.last_id)
+            self.synced_at = time.monotonic()
+            if rows.empty:
+                return 0
+            # Varios envíos de una clínica en el mismo periodo: cuenta el más reciente.
+            merged = pd.concat([self._rows, rows[list(SOURCE_COLUMNS)]], ignore_index=True) if len(self._rows) else rows
+            self._rows = merged[list(SOURCE_COLUMNS)].drop_duplicates(["company_key", "period"], keep="last")
+            self.last_id = int(rows["id"].iloc[-1])
+            self.version += 1
+            self._views = {}
+            return len(rows)
+
+    def periods(self) -> list[str]:
+        return sorted(self._rows["period"].unique(), reverse=True)
+
+    def view(self, period: str) -> PortfolioView:
+        with self._lock:
+            view = self._views.get(period)
+            if view is None:
+                rows = self._rows[self._rows["period"] == period].sort_values("company_key", kind="stable")
+                view = self._views[period] = PortfolioView(rows)
+        return view
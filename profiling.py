@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+
+# Tiempos por sección de cada rerun. Desactivado por defecto; se activa con
+# DASHBOARD_PROFILE=1, o con ?debug=1 en la URL solo si el servidor se inició con
+# DASHBOARD_PROFILE_URL=1 (si no, cualquier visitante podría escribir en el log y ver el panel
+# de depuración). Cada rerun se agrega como una línea JSON a DASHBOARD_PROFILE_LOG. Resumen de
+# percentiles:
+#
+#   python profiling.py perfil_reruns.jsonl
+
+PROFILE_ENV = os.environ.get("DASHBOARD_PROFILE") == "1"
+PROFILE_URL = os.environ.get("DASHBOARD_PROFILE_URL") == "1"
+PROFILE_LOG = os.environ.get("DASHBOARD_PROFILE_LOG", "perfil_reruns.jsonl")
+
+_NULL_SPAN = nullcontext()
+_log_lock = threading.Lock()
+
+
+class RerunProfiler:
+    __slots__ = ("enabled", "kind", "started", "spans")
+
+    def __init__(self, enabled: bool, kind: str = "app") -> None:
+        self.enabled = enabled
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.spans: dict[str, float] = {}
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def record(self, session_id: str, state_bytes: int) -> dict:
+        return {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "session_id": session_id,
+            "kind": self.kind,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "state_bytes": state_bytes,
+            "spans": {name: round(ms, 3) for name, ms in self.spans.items()},
+        }
+
+
+def approx_size(obj: Any, seen: set[int] | None = None) -> int:
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += approx_size(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(approx_size(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    return size
+
+
+def write_record(record: dict, path: str = PROFILE_LOG) -> None:
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _log_lock, open(path, "a", encoding="utf-8") as handle:
+        handle.write(line)
+
+
+def summarize(path: str | Path) -> pd.DataFrame:
+    samples: dict[str, list[float]] = defaultdict(list)
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            record = json.loads(line)
+            samples[f"total ({record['kind']})"].append(record["total_ms"])
+            for name, ms in record["spans"].items():
+                samples[name].append(ms)
+    rows = []
+    for name, values in samples.items():
+        arr = np.asarray(values)
+        rows.append(
+            {
+                "seccion": name,
+                "n": len(arr),
+                "p50_ms": np.percentile(arr, 50),
+                "p95_ms": np.percentile(arr, 95),
+                "p99_ms": np.percentile(arr, 99),
+                "max_ms": arr.max(),
+            }
+        )
+    return pd.DataFrame(rows).sort_values("p99_ms", ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    print(summarize(sys.argv[1] if len(sys.argv) > 1 else PROFILE_LOG).to_string(index=False, float_format="%.2f"))
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from caching import ByteBudgetCache, content_hash
+from kpis import add_channel_conversions, compute_bottlenecks, compute_pipeline
+from state import ChannelTable
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+# plotly se importa dentro de las funciones que construyen figuras: un proceso que no dibuja
+# gráficos (reportes sin gráfico, API) no paga su importación, y el dashboard la paga al
+# dibujar el primer gráfico.
+
+# Caché compartido entre sesiones: entradas idénticas (p. ej. la vista por defecto que ve
+# cada visitante nuevo) reutilizan la misma figura y el mismo HTML.
+RENDER_CACHE_BYTES = 32 * 1024 * 1024
+RENDER_CACHE = ByteBudgetCache(RENDER_CACHE_BYTES)
+
+
+def module_card_html(title: str, value: str, note: str = "", value_class: str = "") -> str:
+    return f"""
+        <div class="module-card">
+            <div class="module-title">{title}</div>
+            <div class="module-value {value_class}">{value}</div>
+            <div class="module-note">{note}</div>
+        </div>
+        """
+
+
+def build_funnel_figure(pipeline_df: pd.DataFrame) -> go.Figure:
+    import plotly.express as px
+
+    fig_pipeline = px.funnel(
+        pipeline_df,
+        x="Cantidad",
+        y="Etapa",
+        color="Etapa",
+        color_discrete_sequence=px.colors.sequential.Blues_r,
+    )
+    fig_pipeline.update_layout(
+        paper_bgcolor="#121843",
+        plot_bgcolor="#121843",
+        font=dict(color="#ffffff"),
+        margin=dict(l=10, r=10, t=10, b=10),
+        legend_title_text="",
+        legend=dict(font=dict(color="#ffffff"), title=dict(font=dict(color="#ffffff"))),
+    )
+    fig_pipeline.update_traces(textfont=dict(color="#ffffff"))
+    fig_pipeline.update_xaxes(tickfont=dict(color="#ffffff"), title_font=dict(color="#ffffff"))
+    fig_pipeline.update_yaxes(tickfont=dict(color="#ffffff"), title_font=dict(color="#ffffff"))
+    return fig_pipeline
+
+
+def build_scenario_heatmap(
+    x: np.ndarray,
+    y: np.ndarray,
+    z: np.ndarray,
+    labels: tuple[str, str, str],
+    current: tuple[float, float],
+) -> go.Figure:
+    import plotly.graph_objects as go
+
+    x_label, y_label, z_label = labels
+    # z tiene forma (len(x), len(y)); el heatmap espera filas por y.
+    fig = go.Figure(
+        go.Heatmap(
+            x=x,
+            y=y,
+            z=z.T,
+            colorscale="Blues",
+            colorbar=dict(title=dict(text=z_label, font=dict(color="#ffffff")), tickfont=dict(color="#ffffff")),
+            hovertemplate=f"{x_label}: %{{x:,.2f}}<br>{y_label}: %{{y:,.2f}}<br>{z_label}: %{{z:,.2f}}<extra></extra>",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=[current[0]],
+            y=[current[1]],
+            mode="markers",
+            marker=dict(color="#ffb347", size=12, symbol="x"),
+            name="Actual",
+            hovertemplate="Escenario actual<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        paper_bgcolor="#121843",
+        plot_bgcolor="#121843",
+        font=dict(color="#ffffff"),
+        margin=dict(l=10, r=10, t=10, b=10),
+        showlegend=False,
+    )
+    fig.update_xaxes(title_text=x_label, tickfont=dict(color="#ffffff"), title_font=dict(color="#ffffff"))
+    fig.update_yaxes(title_text=y_label, tickfont=dict(color="#ffffff"), title_font=dict(color="#ffffff"))
+    return fig
+
+
+def render_channels_table(channels_df: pd.DataFrame) -> str:
+    return channels_df.to_html(index=False, classes="dark-table", border=0)
+
+
+def funnel_key(summary: dict[str, int]) -> str:
+    return content_hash(("funnel", summary))
+
+
+def table_key(channels: ChannelTable, view: tuple = ()) -> str:
+    return content_hash(("tabla", channels.digest(), view))
+
+
+def bottlenecks_key(rates: dict[str, float]) -> str:
+    return content_hash(("cuellos", rates))
+
+
+# La figura se guarda ya construida (Streamlit necesita el objeto); su tamaño se mide por su JSON.
+# Las entradas compartidas no se deben modificar.
+def cached_funnel_figure(key: str, summary: dict[str, int]) -> go.Figure:
+    import plotly.io as pio
+
+    return RENDER_CACHE.get_or_compute(
+        key,
+        lambda: build_funnel_figure(compute_pipeline(summary)),
+        sizeof=lambda fig: len(pio.to_json(fig, validate=False)),
+    )
+
+
+# Con `positions` solo se convierte a HTML esa página de la tabla.
+def cached_channels_table(key: str, channels: ChannelTable, positions: np.ndarray | None = None) -> str:
+    return RENDER_CACHE.get_or_compute(
+        key,
+        lambda: render_channels_table(add_channel_conversions(channels.frame(positions))),
+        sizeof=lambda html: len(html.encode()),
+    )
+
+
+def cached_bottlenecks(key: str, rates: dict[str, float]) -> pd.DataFrame:
+    return RENDER_CACHE.get_or_compute(
+        key,
+        lambda: compute_bottlenecks(rates),
+        sizeof=lambda df: int(df.memory_usage(deep=True).sum()),
+    )
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from kpis import (
+    SUMMARY_KEYS,
+    add_channel_conversions,
+    close_rate_class,
+    compute_bottlenecks,
+    compute_kpis,
+    compute_pipeline,
+    compute_rates,
+    validate_consistency,
+)
+from render import build_funnel_figure, module_card_html, render_channels_table
+from rules import load_rules
+from theme import THEME_CSS
+
+# Generador de reportes sin interfaz: una línea JSON por clínica en la entrada y un
+# reporte HTML + JSON por clínica en la salida, con los mismos cálculos que app.py.
+#
+#   python report.py clinicas.jsonl --out reportes/ --workers 8
+#
+# Cada línea: {"clinic_id", "company", "ticket", "recovery", "summary": {...}, "channels": [{...}]}
+
+DEFAULT_TICKET = 300.0
+DEFAULT_RECOVERY = 50.0
+
+REPORT_CSS = """
+<style>
+body { margin: 0; background-color: #0a1033; font-family: "Source Sans Pro", sans-serif; }
+.report { margin: 0 auto; padding: 24px; }
+.report h1 { color: #f0f4ff; font-size: 1.8rem; }
+.report p { color: #b7c6f6; }
+.cards { display: grid; grid-template-columns: repeat(auto-fit, minmax(190px, 1fr)); gap: 10px; }
+</style>
+"""
+
+
+def iter_lines(path: str | Path) -> Iterator[str]:
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                yield line
+
+
+def iter_clinics(path: str | Path) -> Iterator[dict]:
+    for line in iter_lines(path):
+        yield json.loads(line)
+
+
+def slugify(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", value.lower()).strip("-") or "clinica"
+
+
+def build_report(record: dict) -> dict:
+    channels = pd.DataFrame(record["channels"]).astype(
+        {"leads": int, "citas": int, "pacientes": int, "inversion": float}
+    )
+    summary = {k: int(record["summary"][k]) for k in SUMMARY_KEYS}
+    ticket = float(record.get("ticket", DEFAULT_TICKET))
+    recovery = float(record.get("recovery", DEFAULT_RECOVERY))
+    report = {
+        "clinic_id": str(record.get("clinic_id", "")),
+        "company": str(record.get("company", "")).strip(),
+        "period": record.get("period"),
+        "ticket": ticket,
+        "recovery": recovery,
+        "summary": summary,
+        "errores": validate_consistency(channels, summary),
+    }
+    if report["errores"]:
+        return report
+
+    rates = compute_rates(summary)
+    kpis = compute_kpis(channels, summary, ticket, recovery)
+    diagnosis = load_rules().diagnose(kpis, rates)
+    report.update(
+        {
+            "rates": rates,
+            "kpis": kpis,
+            "feedback_roas": diagnosis["feedback_roas"],
+            "oportunidad": diagnosis["oportunidad"]["mensaje"],
+            "pipeline": compute_pipeline(summary).to_dict(orient="records"),
+            "channels": add_channel_conversions(channels).to_dict(orient="records"),
+        }
+    )
+    return report
+
+
+def report_cards(report: dict) -> list[tuple[str, list[str]]]:
+    summary, rates, kpis = report["summary"], report["rates"], report["kpis"]
+    return [
+        (
+            "Resumen",
+            [
+                module_card_html("Leads totales", f"{kpis['total_leads']:,}", "Etapa 2"),
+                module_card_html("Citas agendadas", f"{summary['Citas agendadas']:,}", "Etapa 2"),
+                module_card_html("Citas asistidas", f"{summary['Citas asistidas']:,}", "Etapa 2"),
+                module_card_html("Pacientes cerrados", f"{kpis['total_ventas']:,}", "Etapa 2"),
+                module_card_html("Inversión total", f"${kpis['total_inversion']:,.0f}", "Suma gasto publicitario"),
+                module_card_html("CPL", f"${kpis['cpl']:,.2f}", "Inversión / Leads totales"),
+                module_card_html("CPA", f"${kpis['cpa']:,.2f}", "Inversión / Ventas"),
+            ],
+        ),
+        (
+            "Conversiones",
+            [
+                module_card_html("Lead → Cita", f"{rates['Lead → Cita']:.1f}%", "Calculado automáticamente"),
+                module_card_html("Show rate", f"{rates['Show rate']:.1f}%", "Calculado automáticamente"),
+                module_card_html("No-Show", f"{rates['No-Show rate']:.1f}%", "Calculado automáticamente"),
+                module_card_html(
+                    "Asistencia → Cierre", f"{rates['Asistencia → Cierre']:.1f}%", "Calculado automáticamente"
+                ),
+                module_card_html(
+                    "Tasa de cierre real",
+                    f"{rates['Tasa de cierre real']:.1f}%",
+                    "Ventas / Leads",
+                    close_rate_class(rates["Tasa de cierre real"]),
+                ),
+            ],
+        ),
+        (
+            "Facturación y proyección",
+            [
+                module_card_html("Facturación actual", f"${kpis['facturacion_actual']:,.0f}", "Ventas x Ticket promedio"),
+                module_card_html("ROAS", f"{kpis['roas']:,.2f}x", "Facturación / Inversión"),
+                module_card_html("No-shows", f"{kpis['no_shows']:,}", "Desde etapa 2"),
+                module_card_html(
+                    "Potencial Recuperable",
+                    f"${kpis['potencial_recuperable']:,.0f}",
+                    f"{report['recovery']:.0f}% de recuperación",
+                ),
+                module_card_html("Dinero perdido", f"${kpis['dinero_perdido']:,.0f}", "No-shows x Ticket promedio"),
+                module_card_html(
+                    "Potencial recuperable anual",
+                    f"${kpis['potencial_recuperable_anual']:,.0f}",
+                    "Potencial recuperable x 12",
+                ),
+                module_card_html("Dinero perdido anual", f"${kpis['dinero_perdido_anual']:,.0f}", "Dinero perdido x 12"),
+            ],
+        ),
+    ]
+
+
+def section(title: str) -> str:
+    return f'<div class="section-box"><h3>{html.escape(title)}</h3></div>'
+
+
+def render_report_html(report: dict, plotlyjs: str = "cdn") -> str:
+    company = html.escape(report["company"] or "Tu Empresa")
+    parts = [f"<h1>Dashboard de Eficiencia Comercial y Retorno de Inversión (ROI) para {company}</h1>"]
+    if report["errores"]:
+        items = "".join(f"<li>{html.escape(e)}</li>" for e in report["errores"])
+        parts.append(section("Errores de validación") + f'<div class="roas-feedback"><ul>{items}</ul></div>')
+    else:
+        for title, cards in report_cards(report):
+            parts.append(section(title) + f'<div class="cards">{"".join(cards)}</div>')
+
+        figure = build_funnel_figure(pd.DataFrame(report["pipeline"]))
+        parts.append(section("Pipeline") + figure.to_html(full_html=False, include_plotlyjs=plotlyjs))
+
+        bottlenecks = compute_bottlenecks(report["rates"]).to_html(index=False, classes="dark-table", border=0)
+        parts.append(section("Cuellos de botella") + f'<div class="table-scroll">{bottlenecks}</div>')
+
+        table_html = render_channels_table(pd.DataFrame(report["channels"]))
+        parts.append(section("Leads por canal + conversiones") + f'<div class="table-scroll">{table_html}</div>')
+
+        feedback = report["feedback_roas"]
+        parts.append(
+            section("Feedback ROAS")
+            + f'<div class="roas-feedback"><strong>{feedback["titulo"]}:</strong><br>{feedback["cuerpo"]}'
+            + f'<div class="roas-note">{feedback["nota"]}</div></div>'
+        )
+        oportunidad = report["oportunidad"].replace("\n", "<br>")
+        parts.append(section("Oportunidad Estratégica Detectada") + f'<div class="roas-feedback">{oportunidad}</div>')
+
+    return (
+        '<!DOCTYPE html>\n<html lang="es">\n<head>\n<meta charset="utf-8">\n'
+        f"<title>Diagnóstico {company}</title>\n{THEME_CSS}{REPORT_CSS}</head>\n"
+        f'<body class="stApp"><div class="report block-container">{"".join(parts)}</div></body>\n</html>\n'
+    )
+
+
+# Una línea mal formada (JSON inválido, claves faltantes, canales vacíos) no detiene la corrida:
+# queda en el índice como {clinic_id, error} y se siguen procesando las demás.
+def generate_report(job: tuple[int, dict | str, str, str]) -> dict:
+    position, record, out_dir, plotlyjs = job
+    try:
+        if isinstance(record, str):
+            record = json.loads(record)
+        return write_report(position, record, out_dir, plotlyjs)
+    except Exception as error:
+        clinic_id = record.get("clinic_id", "") if isinstance(record, dict) else ""
+        return {"linea": position + 1, "clinic_id": str(clinic_id), "error": f"{type(error).__name__}: {error}"}
+
+
+def write_report(position: int, record: dict, out_dir: str, plotlyjs: str) -> dict:
+    report = build_report(record)
+    name = f"{position:05d}-{slugify(report['clinic_id'] or report['company'])}"
+    out = Path(out_dir)
+    with open(out / f"{name}.json", "w", encoding="utf-8") as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+    with open(out / f"{name}.html", "w", encoding="utf-8") as handle:
+        handle.write(render_report_html(report, plotlyjs))
+    return {"archivo": name, "clinic_id": report["clinic_id"], "company": report["company"], "errores": report["errores"]}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera un reporte HTML y JSON por clínica.")
+    parser.add_argument("input", help="Archivo JSONL con una clínica por línea.")
+    parser.add_argument("--out", default="reportes", help="Directorio de salida.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo.")
+    parser.add_argument(
+        "--plotlyjs",
+        choices=["cdn", "inline"],
+        default="cdn",
+        help="'inline' incrusta plotly.js en cada HTML para verlo sin conexión.",
+    )
+    args = parser.parse_args(argv)
+
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    jobs = ((i, line, args.out, args.plotlyjs) for i, line in enumerate(iter_lines(args.input)))
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(generate_report, jobs, chunksize=4))
+    elapsed = time.perf_counter() - started
+
+    with open(Path(args.out) / "indice.json", "w", encoding="utf-8") as handle:
+        json.dump(results, handle, ensure_ascii=False, indent=2)
+
+    failed = [r for r in results if "error" in r]
+    invalid = sum(1 for r in results if r.get("errores"))
+    print(
+        f"{len(results) - len(failed)} reportes en {elapsed:.1f} s con {args.workers} procesos "
+        f"({len(results) / elapsed if elapsed else 0:.1f}/s); {invalid} con errores de validación."
+    )
+    for r in failed:
+        print(f"Línea {r['linea']} ({r['clinic_id'] or 'sin clinic_id'}): {r['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import streamlit as st
+
+from history import HistoryStore
+from peers import PeerIndex
+from portfolio import Portfolio
+
+# Recursos compartidos por todas las sesiones y todas las páginas del proceso. Viven en un
+# módulo aparte para que app.py y pages/ usen la misma instancia de cada uno.
+
+
+@st.cache_resource
+def get_history_store() -> HistoryStore:
+    return HistoryStore()
+
+
+# Compartido por todas las sesiones; cada rerun lo sincroniza como mucho cada SYNC_INTERVAL segundos.
+@st.cache_resource
+def get_peer_index() -> PeerIndex:
+    return PeerIndex()
+
+
+@st.cache_resource
+def get_portfolio() -> Portfolio:
+    return Portfolio()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Agregados diarios por clínica y canal con sumas acumuladas (prefix sums). Cada fila guarda
+# una serie (clínica, canal), un día y la suma acumulada de cada métrica de esa serie hasta
+# ese día, así que el total de cualquier ventana es acum[fin] - acum[inicio - 1].
+#
+# Las filas viven en bloques ordenados por (serie, día). Cada lote nuevo es un bloque y dos
+# bloques vecinos de tamaño parecido se fusionan (como un contador binario), así que agregar
+# cuesta O(filas nuevas) amortizado más O(log días) bloques por consulta, sin recorrer Python
+# por serie. Un mismo día puede repetirse entre bloques: vale el del bloque más nuevo.
+#
+# Los datos atrasados (días anteriores al último de su serie) también se aceptan, pero
+# reconstruyen todas las sumas.
+
+ROLLUP_METRICS = ("leads", "citas", "asistidas", "no_shows", "pacientes", "inversion")
+WINDOWS = (30, 90, 365)
+EPOCH = np.datetime64("1970-01-01", "D")
+DAY_OFFSET = 1 << 31
+NO_DAY = np.iinfo(np.int64).min
+
+
+def day_numbers(dates) -> np.ndarray:
+    return (pd.to_datetime(dates).to_numpy().astype("datetime64[D]") - EPOCH).astype(np.int64)
+
+
+def _keys(series: np.ndarray, days: np.ndarray) -> np.ndarray:
+    return (series.astype(np.int64) << 32) | (days + DAY_OFFSET)
+
+
+def _starts(groups: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+
+# Suma acumulada dentro de cada grupo de filas contiguas.
+def _group_cumsum(groups: np.ndarray, values: np.ndarray) -> np.ndarray:
+    cum = np.cumsum(values, axis=0)
+    starts = _starts(groups)
+    before = cum[starts] - values[starts]
+    return cum - np.repeat(before, np.diff(np.r_[starts, len(groups)]), axis=0)
+
+
+def _merge(older: tuple, newer: tuple) -> tuple[np.ndarray, np.ndarray]:
+    keys = np.concatenate([older[0], newer[0]])
+    cum = np.concatenate([older[1], newer[1]])
+    order = np.argsort(keys, kind="stable")
+    keys, cum = keys[order], cum[order]
+    keep = np.r_[keys[1:] != keys[:-1], True]
+    return keys[keep], cum[keep]
+
+
+class Rollup:
+    def __init__(self) -> None:
+        self._clinics: dict[str, dict[str, int]] = {}
+        self._series = pd.MultiIndex.from_arrays([[], []], names=["clinica", "canal"])
+        self._first = np.empty(0, dtype=np.int64)
+        self._last = np.empty(0, dtype=np.int64)
+        self._total = np.empty((0, len(ROLLUP_METRICS)))
+        self._blocks: list[tuple[np.ndarray, np.ndarray]] = []
+        self.last_day: int | None = None
+        self.rows = 0
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def clinics(self) -> list[str]:
+        return list(self._clinics)
+
+    def _register(self, pairs: pd.MultiIndex) -> np.ndarray:
+        codes = self._series.get_indexer(pairs)
+        missing = codes < 0
+        if missing.any():
+            new = pairs[missing].unique()
+            start = len(self._series)
+            self._series = self._series.append(new)
+            for offset, (clinic, channel) in enumerate(new):
+                self._clinics.setdefault(clinic, {})[channel] = start + offset
+            self._first = np.r_[self._first, np.full(len(new), np.iinfo(np.int64).max)]
+            self._last = np.r_[self._last, np.full(len(new), NO_DAY)]
+            self._total = np.vstack([self._total, np.zeros((len(new), len(ROLLUP_METRICS)))])
+            codes[missing] = self._series.get_indexer(pairs[missing])
+        return codes
+
+    # `frame`: columnas `canal`, `fecha` y las de ROLLUP_METRICS (las que falten valen 0);
+    # `clinica` es opcional. Varias filas del mismo día y canal se suman.
+    def append(self, frame: pd.DataFrame) -> int:
+        if frame.empty:
+            return 0
+        grouped = (
+            pd.DataFrame(
+                {
+                    "clinica": frame["clinica"].astype(str) if "clinica" in frame else "",
+                    "canal": frame["canal"].astype(str),
+                    "dia": day_numbers(frame["fecha"]),
+                    **{m: frame[m].to_numpy(dtype=np.float64) if m in frame else 0.0 for m in ROLLUP_METRICS},
+                }
+            )
+            .groupby(["clinica", "canal", "dia"], sort=False)[list(ROLLUP_METRICS)]
+            .sum()
+        )
+        series = self._register(grouped.index.droplevel("dia"))
+        days = grouped.index.get_level_values("dia").to_numpy(dtype=np.int64)
+        order = np.lexsort((days, series))
+        series, days, values = series[order], days[order], grouped.to_numpy()[order]
+
+        if (days < self._last[series]).any():
+            self._rebuild(series, days, values)
+        else:
+            self._push(series, days, values)
+        newest = int(days.max())
+        self.last_day = newest if self.last_day is None else max(self.last_day, newest)
+        self.rows += len(frame)
+        return len(frame)
+
+    def _push(self, series: np.ndarray, days: np.ndarray, values: np.ndarray) -> None:
+        cum = _group_cumsum(series, values) + self._total[series]
+        self._track(series, days, cum)
+        self._blocks.append((_keys(series, days), cum))
+        while len(self._blocks) > 1 and len(self._blocks[-1][0]) >= len(self._blocks[-2][0]):
+            newer = self._blocks.pop()
+            self._blocks[-1] = _merge(self._blocks[-1], newer)
+
+    def _rebuild(self, series: np.ndarray, days: np.ndarray, values: np.ndarray) -> None:
+        keys, cum = self._compacted()
+        daily = np.diff(cum, axis=0, prepend=np.zeros((1, len(ROLLUP_METRICS))))
+        starts = _starts(keys >> 32)
+        daily[starts] = cum[starts]
+        bins = pd.DataFrame(np.concatenate([daily, values])).groupby(np.r_[keys, _keys(series, days)]).sum()
+        keys = bins.index.to_numpy(dtype=np.int64)
+        series, days = keys >> 32, (keys & 0xFFFFFFFF) - DAY_OFFSET
+        cum = _group_cumsum(series, bins.to_numpy())
+        self._track(series, days, cum)
+        self._blocks = [(keys, cum)]
+
+    def _compacted(self) -> tuple[np.ndarray, np.ndarray]:
+        while len(self._blocks) > 1:
+            newer = self._blocks.pop()
+            self._blocks[-1] = _merge(self._blocks[-1], newer)
+        if not self._blocks:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(ROLLUP_METRICS)))
+        return self._blocks[0]
+
+    # Primer y último día y total acumulado de cada serie, con filas ordenadas por (serie, día).
+    def _track(self, series: np.ndarray, days: np.ndarray, cum: np.ndarray) -> None:
+        starts = _starts(series)
+        ends = np.r_[starts[1:], len(series)] - 1
+        self._first[series[starts]] = np.minimum(self._first[series[starts]], days[starts])
+        self._last[series[ends]] = days[ends]
+        self._total[series[ends]] = cum[ends]
+
+    # Suma acumulada de cada serie hasta cada día (incluido).
+    def _cum_at(self, series: np.ndarray, days: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(series), len(ROLLUP_METRICS)))
+        pending = np.arange(len(series))
+        targets = _keys(series, days)
+        for keys, cum in reversed(self._blocks):
+            if not len(pending):
+                break
+            pos = np.searchsorted(keys, targets[pending], side="right") - 1
+            hit = (pos >= 0) & (keys[np.maximum(pos, 0)] >> 32 == series[pending])
+            out[pending[hit]] = cum[pos[hit]]
+            pending = pending[~hit]
+        return out
+
+    # Totales por canal de los `days` días que terminan en `end` (incluido; por defecto el
+    # último día con datos).
+    def window(self, clinic: str, days: int, end: int | None = None) -> pd.DataFrame:
+        end = self.last_day if end is None else end
+        channels = self._clinics.get(clinic, {}) if end is not None else {}
+        series = np.fromiter(channels.values(), dtype=np.int64, count=len(channels))
+        totals = self._cum_at(series, np.full(len(series), end)) - self._cum_at(series, np.full(len(series), end - days))
+        return pd.DataFrame(totals, index=pd.Index(list(channels), name="canal"), columns=list(ROLLUP_METRICS))
+
+    # Días de la ventana con historia: una clínica con 40 días de datos cubre 40 de los 365.
+    def coverage(self, clinic: str, days: int, end: int | None = None) -> int:
+        end = self.last_day if end is None else end
+        series = list(self._clinics.get(clinic, {}).values())
+        if end is None or not series:
+            return 0
+        return int(np.clip(end - self._first[series].min() + 1, 0, days))
+
+    def report(
+        self, clinic: str, ticket: float, recovery: float, windows: tuple[int, ...] = WINDOWS, end: int | None = None
+    ) -> pd.DataFrame:
+        rows = {}
+        for days in windows:
+            totals = self.window(clinic, days, end).sum()
+            rows[f"{days} días"] = window_kpis(totals, self.coverage(clinic, days, end), ticket, recovery)
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def window_kpis(totals: pd.Series, covered_days: int, ticket: float, recovery: float) -> dict[str, float]:
+    leads, citas, asistidas, no_shows, pacientes, inversion = (float(totals[m]) for m in ROLLUP_METRICS)
+    facturacion = pacientes * ticket
+    dinero_perdido = no_shows * ticket
+    potencial = dinero_perdido * recovery / 100
+    # Con la ventana completa de 365 días el anual es real; con menos historia, se escala.
+    annualize = 365 / covered_days if covered_days else 0.0
+    return {
+        "Días con datos": covered_days,
+        "Leads": leads,
+        "Citas": citas,
+        "Asistidas": asistidas,
+        "No-shows": no_shows,
+        "Pacientes": pacientes,
+        "Inversión": inversion,
+        "CPL": inversion / leads if leads else 0.0,
+        "CPA": inversion / pacientes if pacientes else 0.0,
+        "Show rate": asistidas / citas * 100 if citas else 0.0,
+        "Facturación": facturacion,
+        "ROAS": facturacion / inversion if inversion else 0.0,
+        "Dinero perdido": dinero_perdido,
+        "Potencial recuperable": potencial,
+        "Dinero perdido anual": dinero_perdido * annualize,
+        "Potencial recuperable anual": potencial * annualize,
+    }
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Mapping
+
+import numpy as np
+
+from caching import FILE_CACHE, content_hash
+from kpis import KPI_KEYS
+
+# Reglas de diagnóstico como datos (data/reglas.json, configurable con DASHBOARD_RULES).
+# Cada conjunto de reglas tiene sus campos de texto y una lista ordenada de reglas:
+#
+#   {"id": "roas_critico", "cuando": ["roas < 2"], "titulo": "...", "cuerpo": "...", "nota": "..."}
+#
+# Las condiciones de una regla se combinan con Y; gana la primera regla que se cumple y la
+# última debe ir sin condiciones. Los textos son plantillas de str.format con las métricas de
+# RULE_METRICS, p. ej. "Tu ROAS es {roas:.2f}x". Un lote de clínicas se clasifica con una
+# máscara por regla y np.select, sin recorrer las clínicas en Python.
+
+RULES_PATH = Path(os.environ.get("DASHBOARD_RULES", Path(__file__).resolve().parent / "data" / "reglas.json"))
+
+# nombre en las reglas -> clave en compute_kpis / compute_rates / score_clinics
+RULE_METRICS = {
+    **{k: k for k in KPI_KEYS},
+    "lead_cita": "Lead → Cita",
+    "asistencia_cierre": "Asistencia → Cierre",
+    "show_rate": "Show rate",
+    "no_show_rate": "No-Show rate",
+    "tasa_cierre": "Tasa de cierre real",
+}
+
+OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*$")
+PLACEHOLDER = re.compile(r"(?<!\{)\{(\w+)")
+
+
+class RuleError(ValueError):
+    pass
+
+
+def parse_condition(text: str, rule_id: str) -> tuple[str, str, float]:
+    match = CONDITION.match(text)
+    if match is None:
+        raise RuleError(f"Regla {rule_id!r}: condición inválida {text!r} (formato: 'metrica < valor').")
+    metric, op, value = match.groups()
+    if metric not in RULE_METRICS:
+        raise RuleError(f"Regla {rule_id!r}: métrica desconocida {metric!r}.")
+    return metric, op, float(value)
+
+
+class RuleSet:
+    __slots__ = ("name", "fields", "ids", "conditions", "templates")
+
+    def __init__(self, name: str, spec: dict) -> None:
+        self.name = name
+        self.fields = tuple(spec.get("campos", ()))
+        rules = spec.get("reglas") or []
+        if not self.fields or not rules:
+            raise RuleError(f"El conjunto {name!r} necesita 'campos' y al menos una regla.")
+        if rules[-1].get("cuando"):
+            raise RuleError(f"La última regla de {name!r} debe ir sin condiciones.")
+
+        self.ids = tuple(str(rule.get("id", i)) for i, rule in enumerate(rules))
+        self.conditions = tuple(
+            tuple(parse_condition(text, rule_id) for text in rule.get("cuando", ()))
+            for rule_id, rule in zip(self.ids, rules)
+        )
+        self.templates = {}
+        for field in self.fields:
+            texts = []
+            for rule_id, rule in zip(self.ids, rules):
+                if field not in rule:
+                    raise RuleError(f"Regla {rule_id!r}: falta el campo {field!r}.")
+                unknown = set(PLACEHOLDER.findall(rule[field])) - set(RULE_METRICS)
+                if unknown:
+                    raise RuleError(f"Regla {rule_id!r}: métricas desconocidas en {field!r}: {sorted(unknown)}.")
+                texts.append(rule[field])
+            self.templates[field] = np.array(texts, dtype=object)
+
+    def metrics(self) -> set[str]:
+        used = {metric for conditions in self.conditions for metric, _, _ in conditions}
+        for texts in self.templates.values():
+            used.update(m for text in texts for m in PLACEHOLDER.findall(text))
+        return used
+
+    # Posición de la regla que aplica a cada clínica.
+    def evaluate(self, values: Mapping[str, np.ndarray], size: int) -> np.ndarray:
+        masks = []
+        for conditions in self.conditions:
+            mask = np.ones(size, dtype=bool)
+            for metric, op, threshold in conditions:
+                mask &= OPERATORS[op](values[metric], threshold)
+            masks.append(mask)
+        return np.select(masks, np.arange(len(masks)), default=len(masks) - 1)
+
+    def render(self, positions: np.ndarray, values: Mapping[str, np.ndarray]) -> dict[str, np.ndarray]:
+        rendered = {}
+        for field, templates in self.templates.items():
+            texts = templates[positions]
+            for position, template in enumerate(templates):
+                if "{" not in template:
+                    continue
+                rows = np.flatnonzero(positions == position)
+                texts[rows] = [
+                    template.format_map({m: v[row] for m, v in values.items()}) for row in rows.tolist()
+                ]
+            rendered[field] = texts
+        return rendered
+
+
+class RuleEngine:
+    def __init__(self, spec: dict) -> None:
+        self.sets = {name: RuleSet(name, body) for name, body in spec.items()}
+        self.key = content_hash(spec)
+        self.metrics = sorted(set().union(*(rules.metrics() for rules in self.sets.values())))
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> RuleEngine:
+        with open(path, encoding="utf-8") as handle:
+            return cls(json.load(handle))
+
+    # `scores` es un DataFrame de score_clinics o un dict con los kpis y rates de una clínica.
+    # Devuelve, por conjunto, la regla aplicada ("<conjunto>_regla") y sus textos ("<conjunto>_<campo>").
+    def classify(self, scores) -> dict[str, np.ndarray]:
+        values = {m: np.atleast_1d(np.asarray(scores[RULE_METRICS[m]], dtype=np.float64)) for m in self.metrics}
+        size = int(np.size(scores["roas"]))
+        columns = {}
+        for name, rules in self.sets.items():
+            positions = rules.evaluate(values, size)
+            columns[f"{name}_regla"] = np.array(rules.ids, dtype=object)[positions]
+            for field, texts in rules.render(positions, values).items():
+                columns[f"{name}_{field}"] = texts
+        return columns
+
+    def diagnose(self, kpis: Mapping[str, float], rates: Mapping[str, float]) -> dict[str, dict[str, str]]:
+        columns = self.classify({**kpis, **rates})
+        return {
+            name: {field: str(columns[f"{name}_{field}"][0]) for field in rules.fields}
+            for name, rules in self.sets.items()
+        }
+
+
+# Se relee el archivo cuando cambia: las reglas se ajustan sin reiniciar.
+def load_rules(path: str | Path = RULES_PATH) -> RuleEngine:
+    return FILE_CACHE.get(path, RuleEngine.from_file)
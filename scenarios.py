@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Escenarios what-if de la etapa 3: barre rejillas de ticket, % de recuperación, show rate y
+# tasa de cierre (asistencia → cierre) sobre las citas agendadas e inversión del diagnóstico.
+# Cada eje es una dimensión del arreglo y todas las combinaciones se calculan con una sola
+# operación por difusión (broadcasting). Los resultados son valores esperados, sin truncar.
+
+SCENARIO_AXES = {
+    "ticket": "Ticket promedio ($)",
+    "recovery": "% recuperación",
+    "show_rate": "Show rate (%)",
+    "close_rate": "Asistencia → Cierre (%)",
+}
+
+SCENARIO_METRICS = {
+    "potencial_recuperable": "Potencial recuperable ($)",
+    "facturacion_actual": "Facturación ($)",
+    "roas": "ROAS (x)",
+}
+
+MAX_GRID_STEPS = 500
+
+
+def scenario_base(summary: dict[str, int], ticket: float, recovery: float, total_inversion: float) -> dict[str, float]:
+    agendadas = summary["Citas agendadas"]
+    asistidas = summary["Citas asistidas"]
+    return {
+        "ticket": float(ticket),
+        "recovery": float(recovery),
+        "show_rate": asistidas / agendadas * 100 if agendadas > 0 else 0.0,
+        "close_rate": summary["Pacientes cerrados"] / asistidas * 100 if asistidas > 0 else 0.0,
+        "agendadas": float(agendadas),
+        "inversion": float(total_inversion),
+    }
+
+
+def axis_range(axis: str, base: dict[str, float]) -> tuple[float, float]:
+    if axis == "ticket":
+        return round(base["ticket"] * 0.5, 2), round(max(base["ticket"] * 1.5, 1.0), 2)
+    return 0.0, 100.0
+
+
+def sweep(base: dict[str, float], grids: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    # El i-ésimo eje barrido ocupa la dimensión i; los ejes no barridos toman el valor base.
+    ndim = len(grids)
+    values = {axis: np.float64(base[axis]) for axis in SCENARIO_AXES}
+    for i, (axis, grid) in enumerate(grids.items()):
+        shape = [1] * ndim
+        shape[i] = -1
+        values[axis] = np.asarray(grid, dtype=np.float64).reshape(shape)
+
+    asistidas = base["agendadas"] * values["show_rate"] / 100
+    no_shows = base["agendadas"] - asistidas
+    ventas = asistidas * values["close_rate"] / 100
+    facturacion = ventas * values["ticket"]
+    roas = facturacion / base["inversion"] if base["inversion"] > 0 else facturacion * 0.0
+    potencial = no_shows * values["recovery"] / 100 * values["ticket"]
+
+    shape = tuple(len(grid) for grid in grids.values())
+    return {
+        "potencial_recuperable": np.broadcast_to(potencial, shape),
+        "facturacion_actual": np.broadcast_to(facturacion, shape),
+        "roas": np.broadcast_to(roas, shape),
+    }
+
+
+def sensitivity(base: dict[str, float], metric: str, spread: float = 50.0, steps: int = 41) -> pd.DataFrame:
+    # Curvas de sensibilidad: la métrica al mover cada eje por separado entre -spread% y +spread%
+    # de su valor base (las tasas se limitan a 0-100%).
+    change = np.linspace(-spread, spread, steps)
+    curves = {}
+    for axis, label in SCENARIO_AXES.items():
+        grid = base[axis] * (1 + change / 100)
+        if axis != "ticket":
+            grid = np.clip(grid, 0.0, 100.0)
+        curves[label] = sweep(base, {axis: grid})[metric]
+    return pd.DataFrame(curves, index=pd.Index(change, name="Variación (%)"))
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from caching import content_hash
+from kpis import SUMMARY_KEYS, compute_pipeline, compute_rates
+
+# Registros compactos para st.session_state. Cada sesión abierta guarda sus canales como
+# arreglos de numpy de solo lectura en lugar de DataFrames; la tabla, el pipeline y las
+# tasas se derivan al vuelo. Los registros son inmutables y se comparten sin copiarlos.
+
+COUNT_COLUMNS = ("leads", "citas", "pacientes")
+
+
+def _frozen(values: Any, dtype: type) -> np.ndarray:
+    array = np.array(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+def _digest(*parts: bytes) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part)
+    return h.hexdigest()
+
+
+class ChannelTable:
+    __slots__ = ("names", "inversion", "counts", "_digest", "_counts_digest")
+
+    def __init__(self, names: tuple[str, ...], inversion: Any, counts: Any) -> None:
+        self.names = tuple(names)
+        self.inversion = _frozen(inversion, np.float64)
+        self.counts = _frozen(counts, np.int64).reshape(len(self.names), len(COUNT_COLUMNS))
+        self._digest: str | None = None
+        self._counts_digest: str | None = None
+
+    @classmethod
+    def from_frame(cls, channels_df: pd.DataFrame) -> ChannelTable:
+        return cls(
+            tuple(channels_df["Canal"].astype(str)),
+            channels_df["inversion"].to_numpy(dtype=np.float64),
+            channels_df[list(COUNT_COLUMNS)].to_numpy(dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # Acceso por columna como en un DataFrame: kpis.py suma columnas sin necesitar pandas.
+    def __getitem__(self, column: str) -> np.ndarray:
+        if column == "inversion":
+            return self.inversion
+        return self.counts[:, COUNT_COLUMNS.index(column)]
+
+    # Sin posiciones devuelve la tabla completa; con posiciones, solo esas filas (una página).
+    def frame(self, positions: np.ndarray | None = None) -> pd.DataFrame:
+        if positions is None:
+            names, inversion, counts = list(self.names), self.inversion.copy(), self.counts
+        else:
+            names, inversion, counts = [self.names[i] for i in positions], self.inversion[positions], self.counts[positions]
+        columns = {"Canal": names, "inversion": inversion}
+        columns.update({name: counts[:, i].copy() for i, name in enumerate(COUNT_COLUMNS)})
+        return pd.DataFrame(columns)
+
+    def order(self, column: str = "", descending: bool = False) -> np.ndarray:
+        if not column:
+            positions = np.arange(len(self))
+            return positions[::-1] if descending else positions
+        values = np.array(self.names) if column == "Canal" else self[column]
+        positions = np.argsort(values, kind="stable")
+        return positions[::-1] if descending else positions
+
+    # Aplica lo editado en una página (filas `positions` de esta tabla) y devuelve una tabla
+    # nueva. `edited` es lo que devuelve st.data_editor sobre frame(positions): las etiquetas
+    # 0..len(positions)-1 son filas existentes, las faltantes se borraron y las mayores son
+    # filas agregadas, que van al final de la tabla.
+    def apply_page_edits(self, positions: np.ndarray, edited: pd.DataFrame) -> ChannelTable:
+        size = len(positions)
+        labels = edited.index.to_numpy(dtype=np.int64)
+        existing = labels < size
+        rows = positions[labels[existing]]
+
+        names = list(self.names)
+        inversion = self.inversion.copy()
+        counts = self.counts.copy()
+        kept = edited[existing]
+        inversion[rows] = kept["inversion"].fillna(0.0).to_numpy(dtype=np.float64)
+        counts[rows] = kept[list(COUNT_COLUMNS)].fillna(0).to_numpy(dtype=np.int64)
+        for row, name in zip(rows, kept["Canal"]):
+            if isinstance(name, str) and name.strip():
+                names[row] = name
+
+        keep = np.ones(len(self), dtype=bool)
+        keep[np.setdiff1d(positions, rows)] = False
+        added = edited[~existing]
+        added_names = [
+            name if isinstance(name, str) and name.strip() else f"Canal {len(self) + i + 1}"
+            for i, name in enumerate(added["Canal"])
+        ]
+        return ChannelTable(
+            tuple(n for n, k in zip(names, keep) if k) + tuple(added_names),
+            np.concatenate([inversion[keep], added["inversion"].fillna(0.0).to_numpy(dtype=np.float64)]),
+            np.concatenate([counts[keep], added[list(COUNT_COLUMNS)].fillna(0).to_numpy(dtype=np.int64)]),
+        )
+
+    # Huellas de contenido, calculadas una sola vez por tabla (las tablas no cambian).
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = _digest("\x1f".join(self.names).encode(), self.inversion.tobytes(), self.counts.tobytes())
+        return self._digest
+
+    def counts_digest(self) -> str:
+        if self._counts_digest is None:
+            self._counts_digest = _digest(self.counts.tobytes())
+        return self._counts_digest
+
+
+class Diagnosis:
+    __slots__ = ("company", "period", "channels", "summary_values", "ticket", "recovery", "clinic_type", "key")
+
+    def __init__(
+        self,
+        company: str,
+        period: str,
+        channels: ChannelTable,
+        summary: dict[str, int],
+        ticket: float,
+        recovery: float,
+        clinic_type: str = "",
+    ) -> None:
+        self.company = company
+        self.period = period
+        self.channels = channels
+        self.summary_values = tuple(int(summary[k]) for k in SUMMARY_KEYS)
+        self.ticket = float(ticket)
+        self.recovery = float(recovery)
+        self.clinic_type = clinic_type
+        self.key = content_hash(
+            (company, period, channels.digest(), self.summary_values, self.ticket, self.recovery, clinic_type)
+        )
+
+    @property
+    def summary(self) -> dict[str, int]:
+        return dict(zip(SUMMARY_KEYS, self.summary_values))
+
+    @property
+    def rates(self) -> dict[str, float]:
+        return compute_rates(self.summary)
+
+    @property
+    def pipeline(self) -> pd.DataFrame:
+        return compute_pipeline(self.summary)
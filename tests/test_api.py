@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from api import DEFAULT_RECOVERY, DEFAULT_TICKET, PayloadError, ScoringServer, parse_record, score_records
+from kpis import DEFAULT_CHANNELS, build_default_summary, compute_kpis
+
+
+def payload(**changes) -> dict:
+    record = {
+        "clinic_id": "c1",
+        "company": " Clínica Norte ",
+        "ticket": 300.0,
+        "recovery": 50.0,
+        "summary": build_default_summary(DEFAULT_CHANNELS),
+        "channels": DEFAULT_CHANNELS.to_dict(orient="records"),
+    }
+    record.update(changes)
+    return record
+
+
+def test_parse_record_normalizes_fields():
+    record = parse_record(payload(ticket=250, recovery="40"))
+    assert record["company"] == "Clínica Norte"
+    assert (record["ticket"], record["recovery"]) == (250.0, 40.0)
+    assert record["counts"][0] == (100, 60, 35)
+    missing = payload()
+    del missing["ticket"], missing["recovery"]
+    assert (parse_record(missing)["ticket"], parse_record(missing)["recovery"]) == (DEFAULT_TICKET, DEFAULT_RECOVERY)
+
+
+@pytest.mark.parametrize("count", [True, 3.9, -5, "7", None, float("inf"), 2**63])
+def test_parse_record_rejects_non_counts(count):
+    summary = {**build_default_summary(DEFAULT_CHANNELS), "Leads totales": count}
+    with pytest.raises(PayloadError):
+        parse_record(payload(summary=summary))
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [{"ticket": float("nan")}, {"recovery": "Infinity"}, {"summary": {}}, {"channels": [{"leads": 1}]}, {"ticket": []}],
+)
+def test_parse_record_rejects_invalid_payloads(changes):
+    with pytest.raises(PayloadError):
+        parse_record(payload(**changes))
+
+
+def test_parse_record_rejects_non_objects():
+    with pytest.raises(PayloadError):
+        parse_record([payload()])
+
+
+def test_score_records_matches_compute_kpis():
+    record = payload()
+    result = score_records([parse_record(record)])[0]
+    expected = compute_kpis(DEFAULT_CHANNELS, record["summary"], record["ticket"], record["recovery"])
+    assert result["errores"] == []
+    assert result["kpis"] == pytest.approx(expected)
+    assert set(result["feedback_roas"]) == {"titulo", "cuerpo", "nota"}
+    assert isinstance(result["oportunidad"], str)
+
+
+def test_score_route_status_codes():
+    server = ScoringServer()
+
+    def post(body: bytes):
+        return asyncio.run(server.route("POST", "/score", body))
+
+    assert post(json.dumps(payload()).encode())[0] == HTTPStatus.OK
+    assert post(b'{"a":"\xff"}') == (HTTPStatus.BAD_REQUEST, {"error": "JSON inválido."})
+    assert post(b"{")[0] == HTTPStatus.BAD_REQUEST
+    assert post(json.dumps(payload(ticket="caro")).encode())[0] == HTTPStatus.BAD_REQUEST
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kpis import (
+    KPI_KEYS,
+    RATE_KEYS,
+    SUMMARY_KEYS,
+    VALIDATION_MESSAGES,
+    compute_kpis,
+    compute_rates,
+    score_clinics,
+    validate_batch,
+    validate_consistency,
+)
+
+
+# Clínicas aleatorias con casos borde: sin leads, sin ventas, sin inversión y resúmenes que no
+# cuadran con los canales.
+def random_batch(n: int = 400, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(1, 6, n)
+    clinic_id = np.repeat(np.arange(n), sizes)
+    leads = rng.integers(0, 200, len(clinic_id))
+    citas = (leads * rng.uniform(0, 1, len(leads))).astype(np.int64)
+    pacientes = (citas * rng.uniform(0, 1, len(citas))).astype(np.int64)
+    inversion = np.round(rng.uniform(0, 3000, len(clinic_id)), 2)
+    inversion[rng.random(len(clinic_id)) < 0.1] = 0.0
+    channels = pd.DataFrame(
+        {"clinic_id": clinic_id, "inversion": inversion, "leads": leads, "citas": citas, "pacientes": pacientes}
+    )
+
+    sums = channels.groupby("clinic_id")[["leads", "citas", "pacientes"]].sum()
+    asistidas = (sums["citas"] * rng.uniform(0, 1.1, n)).astype(np.int64)
+    clinics = pd.DataFrame(
+        {
+            "clinic_id": np.arange(n),
+            "Leads totales": sums["leads"].to_numpy() + (rng.random(n) < 0.1),
+            "Leads calificados": (sums["leads"] * rng.uniform(0, 1.1, n)).astype(np.int64).to_numpy(),
+            "Citas agendadas": sums["citas"].to_numpy(),
+            "Citas asistidas": asistidas.to_numpy(),
+            "Citas no asistidas": (sums["citas"] - asistidas).to_numpy() + (rng.random(n) < 0.1),
+            "Pacientes cerrados": sums["pacientes"].to_numpy(),
+            "ticket": rng.choice([0.0, 150.0, 299.99, 300.0, 1250.5], n),
+            "recovery": rng.choice([0.0, 33.3, 50.0, 100.0], n),
+        }
+    )
+    clinics.loc[:5, [*SUMMARY_KEYS]] = 0
+    channels.loc[channels["clinic_id"] < 6, ["leads", "citas", "pacientes"]] = 0
+    return clinics, channels
+
+
+def clinic_inputs(clinics: pd.DataFrame, channels: pd.DataFrame, position: int):
+    row = clinics.iloc[position]
+    summary = {k: int(row[k]) for k in SUMMARY_KEYS}
+    return channels[channels["clinic_id"] == row["clinic_id"]], summary, row
+
+
+def test_score_clinics_matches_scalar_functions():
+    clinics, channels = random_batch()
+    scores = score_clinics(clinics, channels)
+    for position in range(len(clinics)):
+        channel_rows, summary, row = clinic_inputs(clinics, channels, position)
+        expected = {
+            **compute_kpis(channel_rows, summary, row["ticket"], row["recovery"]),
+            **compute_rates(summary),
+        }
+        actual = scores.iloc[position]
+        for key in (*KPI_KEYS, *RATE_KEYS):
+            assert actual[key] == pytest.approx(expected[key], rel=1e-12, abs=1e-9), (position, key)
+
+
+def test_rates_batch_rounds_like_python_round():
+    # Casi-empates donde np.round y round() difieren.
+    summary = {k: 0 for k in SUMMARY_KEYS}
+    clinics = []
+    for citas, leads in [(3, 2000), (57, 2000), (1, 400), (7, 2000), (29, 2000), (1, 800), (29, 400), (1, 3)]:
+        clinics.append({**summary, "Leads totales": leads, "Citas agendadas": citas, "clinic_id": len(clinics)})
+    clinics = pd.DataFrame(clinics).assign(ticket=300.0, recovery=50.0)
+    channels = pd.DataFrame(
+        {"clinic_id": clinics["clinic_id"], "inversion": 0.0, "leads": 0, "citas": 0, "pacientes": 0}
+    )
+    scores = score_clinics(clinics, channels)
+    for position, row in clinics.iterrows():
+        summary_row = {k: int(row[k]) for k in SUMMARY_KEYS}
+        assert scores.iloc[position]["Lead → Cita"] == compute_rates(summary_row)["Lead → Cita"]
+
+
+def test_validate_batch_matches_validate_consistency():
+    clinics, channels = random_batch(seed=1)
+    failed = validate_batch(clinics, channels)
+    messages = failed.groupby("clinic_id", observed=True)["regla"].agg(
+        lambda rules: [VALIDATION_MESSAGES[r] for r in rules]
+    )
+    assert not failed.empty
+    for position in range(len(clinics)):
+        channel_rows, summary, row = clinic_inputs(clinics, channels, position)
+        assert messages.get(row["clinic_id"], []) == validate_consistency(channel_rows, summary), position
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from latency import LATENCY_STAGES, MIN_HOURS, RELATIVE_ACCURACY, LatencyProfile
+
+START = pd.Timestamp("2025-01-01")
+
+
+def events(n: int, seed: int) -> tuple[pd.Series, pd.DataFrame, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    hours = rng.lognormal(3, 1.5, n)
+    lead = START + pd.to_timedelta(rng.uniform(0, 24 * 365, n), "h")
+    frame = pd.DataFrame({"fecha": lead, "fecha_cita": lead + pd.to_timedelta(hours, "h")})
+    channels = pd.Series(rng.choice(["Meta Ads", "Google Ads"], n)).astype("category")
+    return channels, frame, (frame["fecha_cita"] - frame["fecha"]).to_numpy() / np.timedelta64(1, "h")
+
+
+# Mismo rango que usa LatencyProfile.quantiles sobre los valores ordenados.
+def exact_quantile(hours: np.ndarray, q: float) -> float:
+    ordered = np.sort(hours)
+    return float(ordered[int(q / 100 * (len(ordered) - 1))])
+
+
+def test_quantiles_within_relative_accuracy():
+    channels, frame, hours = events(20_000, seed=0)
+    profile = LatencyProfile()
+    assert profile.add(channels, frame) == len(frame)
+    for channel in (None, "Meta Ads"):
+        sample = hours if channel is None else hours[(channels == channel).to_numpy()]
+        table = profile.quantiles((1, 25, 50, 90, 99), channel)
+        assert table.loc["Lead → Cita", "Medidos"] == len(sample)
+        for q in (1, 25, 50, 90, 99):
+            exact = exact_quantile(sample, q)
+            assert exact > MIN_HOURS
+            assert abs(table.loc["Lead → Cita", f"P{q}"] - exact) <= RELATIVE_ACCURACY * exact * (1 + 1e-9)
+
+
+def test_merge_equals_single_profile():
+    channels, frame, _ = events(5_000, seed=1)
+    whole = LatencyProfile()
+    whole.add(channels, frame)
+    first, second = LatencyProfile(), LatencyProfile()
+    first.add(channels[:2_000], frame[:2_000])
+    second.add(channels[2_000:].reset_index(drop=True), frame[2_000:].reset_index(drop=True))
+    merged = first.merge(second)
+    pd.testing.assert_frame_equal(merged.quantiles(), whole.quantiles())
+    pd.testing.assert_frame_equal(merged.histogram("Google Ads"), whole.histogram("Google Ads"))
+
+
+def test_negative_and_invalid_dates_are_not_measured():
+    frame = pd.DataFrame(
+        {
+            "fecha": ["2026-01-05", "2026-01-05 08:00", "2026-01-05", "2026-01-05", "no es fecha"],
+            "fecha_cita": ["2026-01-05 10:00", "2026-01-06", "2026-01-04", "", "2026-01-06"],
+        }
+    )
+    profile = LatencyProfile()
+    assert profile.add(pd.Series(["Meta Ads"] * len(frame)).astype("category"), frame) == 2
+    assert profile.skipped == 1
+    assert profile.invalid == {"fecha": 1}
+    assert profile.quantiles().loc[list(LATENCY_STAGES)[1:], "Medidos"].eq(0).all()
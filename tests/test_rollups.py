@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import ROLLUP_METRICS, Rollup, day_numbers
+
+CLINICS = ("c1", "c2", "c3")
+CHANNELS = ("Meta Ads", "Google Ads", "Orgánico")
+START = pd.Timestamp("2025-01-01")
+
+
+def daily_rows(days: np.ndarray, rng: np.random.Generator) -> pd.DataFrame:
+    n = len(days)
+    return pd.DataFrame(
+        {
+            "clinica": rng.choice(CLINICS, n),
+            "canal": rng.choice(CHANNELS, n),
+            "fecha": START + pd.to_timedelta(days, "D"),
+            **{m: rng.integers(0, 20, n).astype(np.float64) for m in ROLLUP_METRICS},
+        }
+    )
+
+
+def brute_window(rows: pd.DataFrame, clinic: str, days: int, end: int) -> pd.DataFrame:
+    day = day_numbers(rows["fecha"])
+    inside = (rows["clinica"] == clinic).to_numpy() & (day > end - days) & (day <= end)
+    return rows[inside].groupby("canal")[list(ROLLUP_METRICS)].sum()
+
+
+def assert_windows(rollup: Rollup, rows: pd.DataFrame) -> None:
+    first = day_numbers(rows["fecha"]).min()
+    for clinic in CLINICS:
+        for days in (1, 7, 30, 90, 365):
+            for end in (rollup.last_day, rollup.last_day - 3, first + 10, first - 1):
+                window = rollup.window(clinic, days, end)
+                expected = brute_window(rows, clinic, days, end).reindex(window.index, fill_value=0.0)
+                np.testing.assert_allclose(window.to_numpy(), expected.to_numpy(), err_msg=f"{clinic} {days} {end}")
+                # Los canales sin filas en la ventana salen en 0, pero los que tienen filas están todos.
+                assert set(brute_window(rows, clinic, days, end).index) <= set(window.index)
+
+
+@pytest.mark.parametrize("batches", [1, 5, 40])
+def test_windows_match_brute_force(batches):
+    rng = np.random.default_rng(batches)
+    days = np.sort(rng.integers(0, 400, 3000))
+    rows = daily_rows(days, rng)
+    rollup = Rollup()
+    for chunk in np.array_split(np.arange(len(rows)), batches):
+        rollup.append(rows.iloc[chunk])
+    assert rollup.rows == len(rows)
+    assert_windows(rollup, rows)
+
+
+def test_late_data_rebuilds_sums():
+    rng = np.random.default_rng(7)
+    rows = daily_rows(np.sort(rng.integers(0, 200, 1000)), rng)
+    late = daily_rows(rng.integers(0, 200, 300), rng)
+    rollup = Rollup()
+    rollup.append(rows)
+    rollup.append(late)
+    assert_windows(rollup, pd.concat([rows, late], ignore_index=True))
+
+
+def test_coverage_counts_days_since_first_row():
+    rows = daily_rows(np.array([100, 120, 139]), np.random.default_rng(0)).assign(clinica="c1")
+    rollup = Rollup()
+    rollup.append(rows)
+    last = day_numbers(rows["fecha"]).max()
+    assert rollup.coverage("c1", 365) == 40
+    assert rollup.coverage("c1", 30) == 30
+    assert rollup.coverage("c1", 365, end=last - 39) == 1
+    assert rollup.coverage("c1", 365, end=last - 40) == 0
+    assert rollup.coverage("otra", 365) == 0
@@ -0,0 +1,9 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+# El tema vive en static/theme.css y se lee una sola vez al importar el módulo. El dashboard y
+# los reportes HTML lo incrustan como bloque <style>: el servidor de archivos estáticos de
+# Streamlit 1.41 entrega los .css como text/plain con nosniff y el navegador no los aplica.
+THEME_PATH = Path(__file__).parent / "static" / "theme.css"
+THEME_CSS = f"\n<style>\n{THEME_PATH.read_text(encoding='utf-8')}</style>\n"